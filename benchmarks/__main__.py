@@ -0,0 +1,89 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Run the benchmark suites without asv.
+
+The time_* methods give the best of repeated calls, the peakmem_* methods
+give the peak memory traced by tracemalloc during the call, and the
+track_* methods give their values. Results are printed as a table, and
+saved as JSON if required, so runs can be compared.
+
+Usage
+-----
+    $ python3 -m benchmarks --sizes 512 1024 --json results.json
+"""
+
+import sys
+import json
+import argparse
+import tracemalloc
+
+from . import bench_pipeline
+
+SUITES = [bench_pipeline.EGFilterSuite,bench_pipeline.PipelineSuite,
+          bench_pipeline.ClusterSuite]
+
+def run_benchmark(suite,name,param,repeat):
+    """Run a method of a set up suite, return its (value,unit)"""
+    method = getattr(suite,name)
+    if name.startswith('time_'):
+        return bench_pipeline.best_time(lambda: method(param),repeat),"s"
+    if name.startswith('peakmem_'):
+        tracemalloc.start()
+        try:
+            method(param)
+            _,peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak / 1024**2,"MB"
+    return method(param),getattr(method,"unit","")
+
+def run_suite(suite_cls,params,repeat=3,pattern=""):
+    """Generate the results of a suite for each parameter"""
+    names = [name for name in sorted(dir(suite_cls))
+             if name.startswith(('time_','peakmem_','track_'))
+             and pattern in name]
+    for param in params:
+        suite = suite_cls()
+        try:
+            suite.setup(param)
+        except NotImplementedError:
+            continue
+        for name in names:
+            value,unit = run_benchmark(suite,name,param,repeat)
+            yield {"suite": suite_cls.__name__, "name": name,
+                   "param": param, "value": value, "unit": unit}
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of the detection pipeline.")
+    parser.add_argument("-s","--sizes",type=int,nargs="+",default=[512,1024],
+                        help="Image sizes of the pipeline suites.")
+    parser.add_argument("-r","--repeat",type=int,default=3,
+                        help="Repeats of the timed calls.")
+    parser.add_argument("-b","--bench",default="",
+                        help="Only run the benchmarks whose name contains it.")
+    parser.add_argument("--json",default=None,
+                        help="Filepath to save the results.")
+    args = parser.parse_args(argv[1:])
+
+    results = []
+    print("%-14s %-28s %6s %14s  %s" % ("suite","benchmark","param",
+                                         "value","unit"))
+    for suite_cls in SUITES:
+        params = suite_cls.params
+        if suite_cls.param_names == ['size']:
+            params = args.sizes
+        for result in run_suite(suite_cls,params,args.repeat,args.bench):
+            results.append(result)
+            print("%-14s %-28s %6d %14.6g  %s" % (
+                result["suite"],result["name"],result["param"],
+                result["value"],result["unit"]))
+            sys.stdout.flush()
+    if args.json is not None:
+        with open(args.json,'w') as fp:
+            json.dump(results,fp,indent=1)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,179 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Benchmarks of the detection pipeline on synthetic X-ray fields.
+
+The suites follow the conventions of airspeed velocity (asv), methods
+time_* are timed, peakmem_* give the peak memory, and track_* return the
+throughputs, i.e., megapixels per second of the smoothing and candidates
+per second of the peak search and the snr. A suite raising
+NotImplementedError in setup is skipped for that parameter. They run with
+asv by asv.conf.json of the repository, or without asv by
+
+    $ python3 -m benchmarks --sizes 512 1024 2048
+
+Fields
+------
+Poisson fields of utils.gen_field with DENSITY point sources per megapixel,
+whose sigmas are within AXES, are generated once for each size.
+
+Suites
+------
+EGFilterSuite:
+    EGFilter.get_filter over the scales
+PipelineSuite:
+    PeakDetector.smooth, locate_peaks, get_pslist, compute_snr,
+    utils.cluster_kdtree and utils.compare over the image sizes
+ClusterSuite:
+    The legacy utils.cluster, which is quadratic and limited to
+    LEGACY_MAX_SIZE
+"""
+
+import time
+
+import numpy as np
+
+from egf2ps.configs import Configs
+from egf2ps.utils import utils
+from egf2ps.basiclass import EGFilter
+from egf2ps.basiclass import PeakDetector
+from egf2ps.basiclass import Convolver
+from egf2ps.basiclass import FilterBank
+from egf2ps.basiclass import IntegralImage
+from egf2ps.basiclass import compute_snr
+
+# Image sizes from 512^2 to 8k^2
+SIZES = [512,1024,2048,4096,8192]
+# Point sources per megapixel, and the range of their sigmas
+DENSITY = 200
+AXES = (1.5,4.0)
+# The filter of the stage benchmarks, and the bank giving the candidates
+SCALE = 8
+SIGMA = (2.0,2.0)
+BANK_SIGMAS = [1.5,2.5]
+BANK_ANGLES = [0.0,np.pi/4]
+# Largest size of the legacy clustering
+LEGACY_MAX_SIZE = 1024
+
+_fields = {}
+
+def get_field(size):
+    """Get the (img_mat,ps) of a synthetic field, generated only once"""
+    if size not in _fields:
+        num_ps = max(int(DENSITY * size**2 / 1e6),1)
+        _fields[size] = utils.gen_field((size,size),num_ps,axes=AXES,
+                                        seed=size)
+    return _fields[size]
+
+def get_candidates(configs,imgmat,integral):
+    """Get the stacked pslists of a small filter bank"""
+    bank = FilterBank([SCALE],BANK_SIGMAS,BANK_SIGMAS,BANK_ANGLES)
+    convolver = Convolver(imgmat,mode=configs.getn_value('runtime/conv_mode'))
+    pslists = [PeakDetector(configs,imgmat,egf,convolver,
+                            integral=integral).get_pslist()
+               for egf in bank.get_filters()]
+    return np.vstack(pslists)
+
+def best_time(func,repeat=3):
+    """Best wall time in seconds of the calls"""
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# Defination of class
+class EGFilterSuite:
+    params = [4,8,16,32,64]
+    param_names = ['scale']
+
+    def setup(self,scale):
+        self.egfilter = EGFilter(scale=(scale,scale),sigma=SIGMA)
+
+    def time_get_filter(self,scale):
+        self.egfilter.get_filter()
+
+class PipelineSuite:
+    params = SIZES
+    param_names = ['size']
+    timeout = 1800
+
+    def setup(self,size):
+        self.configs = Configs()
+        self.imgmat,self.ps_ref = get_field(size)
+        self.egfilter = EGFilter(scale=(SCALE,SCALE),sigma=SIGMA)
+        self.integral = IntegralImage(self.imgmat)
+        pd = self._get_detector()
+        pd.smooth()
+        self.imgsmooth = pd.imgsmooth
+        self.cand = get_candidates(self.configs,self.imgmat,self.integral)
+        self.pslist = utils.cluster_kdtree(self.cand)
+
+    def _get_detector(self,imgsmooth=None):
+        """A PeakDetector with a new convolver, i.e., no cached spectrum"""
+        convolver = Convolver(self.imgmat,
+                              mode=self.configs.getn_value('runtime/conv_mode'))
+        return PeakDetector(self.configs,self.imgmat,self.egfilter,convolver,
+                            imgsmooth,self.integral)
+
+    def time_smooth(self,size):
+        self._get_detector().smooth()
+
+    def time_locate_peaks(self,size):
+        self._get_detector(self.imgsmooth).locate_peaks()
+
+    def time_get_pslist(self,size):
+        self._get_detector(self.imgsmooth).get_pslist()
+
+    def time_snr(self,size):
+        compute_snr(self.imgmat,self.cand[:,0:2],self.cand[:,2:4],
+                    self.cand[:,4],self.integral)
+
+    def time_cluster_kdtree(self,size):
+        utils.cluster_kdtree(self.cand)
+
+    def time_compare(self,size):
+        utils.compare(self.pslist,self.ps_ref)
+
+    def peakmem_smooth(self,size):
+        self._get_detector().smooth()
+
+    def peakmem_get_pslist(self,size):
+        self._get_detector(self.imgsmooth).get_pslist()
+
+    def track_smooth_mpix_per_s(self,size):
+        seconds = best_time(lambda: self.time_smooth(size))
+        return size**2 / 1e6 / seconds
+    track_smooth_mpix_per_s.unit = "MP/s"
+
+    def track_get_pslist_cand_per_s(self,size):
+        pd = self._get_detector(self.imgsmooth)
+        seconds = best_time(pd.get_pslist)
+        return len(pd.peaklist[0]) / seconds
+    track_get_pslist_cand_per_s.unit = "candidates/s"
+
+    def track_snr_cand_per_s(self,size):
+        seconds = best_time(lambda: self.time_snr(size))
+        return len(self.cand) / seconds
+    track_snr_cand_per_s.unit = "candidates/s"
+
+    def track_num_candidates(self,size):
+        return len(self.cand)
+    track_num_candidates.unit = "candidates"
+
+class ClusterSuite:
+    params = SIZES
+    param_names = ['size']
+    timeout = 1800
+
+    def setup(self,size):
+        if size > LEGACY_MAX_SIZE:
+            raise NotImplementedError("utils.cluster is quadratic")
+        self.configs = Configs()
+        imgmat,_ = get_field(size)
+        self.cand = get_candidates(self.configs,imgmat,IntegralImage(imgmat))
+
+    def time_cluster(self,size):
+        utils.cluster(self.cand)
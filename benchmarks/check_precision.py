@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Tolerance check of the float32 precision policy, i.e., runtime/precision.
+
+The final pslists of Detector.get_final computed in float64 and in float32
+are compared on the reference images, which are input/imgpath of the
+configurations and synthetic Poisson fields by utils.gen_field. They are
+taken as unchanged if
+
+- the same number of point sources are detected,
+- the cores are the same,
+- the axes are within RTOL_AXIS, and the peaks within ATOL_PEAK.
+
+The angles are not compared, since the angle of a nearly circular source
+is decided among kernels which are the same in float32 rounding.
+
+Usage
+-----
+    $ python3 benchmarks/check_precision.py <confpath> --synthetic 3
+
+The exit status is 1 if any image fails.
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+
+import numpy as np
+from astropy.io import fits
+
+from egf2ps.configs import Configs
+from egf2ps.utils import utils
+from egf2ps.detector import Detector
+
+RTOL_AXIS = 1e-6
+ATOL_PEAK = 1e-4
+
+def get_final(configs,imgpath,precision):
+    """Get the final pslist of an image in the precision"""
+    detector = Detector(configs,imgpath=imgpath)
+    detector.dtype = np.dtype(precision)
+    detector.save = False
+    return detector.get_final()
+
+def check_image(configs,imgpath):
+    """
+    Compare the float64 and float32 pslists of an image
+
+    Returns
+    -------
+    passed: bool
+        Whether the pslists agree within the tolerances
+    msg: str
+        Summary of the differences
+    """
+    ps64 = get_final(configs,imgpath,'float64')
+    ps32 = get_final(configs,imgpath,'float32')
+    if ps64.shape != ps32.shape:
+        return False,"%d vs %d point sources" % (ps64.shape[0],ps32.shape[0])
+    if ps64.shape[0] == 0:
+        return True,"no point sources"
+    same_cores = np.array_equal(ps64[:,0:2],ps32[:,0:2])
+    err_axis = np.max(np.abs(ps64[:,2:4]-ps32[:,2:4])/np.abs(ps64[:,2:4]))
+    err_peak = np.max(np.abs(ps64[:,5]-ps32[:,5]))
+    passed = same_cores and err_axis <= RTOL_AXIS and err_peak <= ATOL_PEAK
+    msg = ("%d point sources, same cores: %s, axis error %.2e, "
+           "peak error %.2e" % (ps64.shape[0],same_cores,err_axis,err_peak))
+
+    return passed,msg
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Check the float32 final pslists against float64.")
+    parser.add_argument("configs", help="Configuration filepath")
+    parser.add_argument("-s","--synthetic",type=int,default=0,
+                        help="Number of synthetic fields to check besides "
+                        "the image of the configurations.")
+    parser.add_argument("--size",type=int,default=512,
+                        help="Size of the synthetic fields.")
+    args = parser.parse_args(argv[1:])
+
+    configs = Configs(args.configs)
+    images = []
+    imgpath = configs.getn_value('input/imgpath')
+    if imgpath != "":
+        images.append(imgpath)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for seed in range(args.synthetic):
+            img_mat,_ = utils.gen_field((args.size,args.size),seed=seed)
+            fieldpath = os.path.join(tmpdir,"field_%d.fits" % seed)
+            fits.writeto(fieldpath,img_mat)
+            images.append(fieldpath)
+        failed = 0
+        for imgpath in images:
+            passed,msg = check_image(configs,imgpath)
+            failed += not passed
+            print("[%s] %s: %s" % ("PASS" if passed else "FAIL",
+                                   os.path.basename(imgpath),msg))
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -2,5 +2,14 @@
 # MIT license
 
 from .pointsource import PointSource
+from .pointsource import compute_snr
 from .egfilters import EGFilter
 from .peakdetector import PeakDetector
+from .peakdetector import suppress_peaks
+from .convolver import Convolver
+from .filterbank import FilterBank
+from .steerable import SteerableFilter
+from .integralimage import IntegralImage
+from .candidatestore import CandidateStore
+from .candidatestore import to_pslist
+from .responsecache import ResponseCache
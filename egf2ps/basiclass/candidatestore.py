@@ -0,0 +1,124 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Design of a class namely CandidateStore, which accumulates the potential
+point sources of all filters in one growable structured array.
+
+Parameters
+----------
+chunk_size: int
+    Number of candidates of one chunk, the capacity grows by whole chunks.
+
+Columns
+-------
+| Field     | Type    | Comment                          |
+| :-------: | :-----: | -------------------------------- |
+| x         | int32   | core_x                           |
+| y         | int32   | core_y                           |
+| axis_x    | float64 | axis_x                           |
+| axis_y    | float64 | axis_y                           |
+| angle     | float64 | angle in degree                  |
+| peak      | float64 | normalized peak                  |
+| snr       | float64 | signal-to-noise ratio            |
+| filter_id | int32   | index of the filter in the bank  |
+
+Methods
+-------
+append:
+    Append the pslist of one filter
+to_array:
+    Get the candidates as a contiguous structured array
+to_matrix:
+    Get the candidates as the (num,7) matrix of PeakDetector.get_pslist
+
+Functions
+---------
+to_pslist:
+    Transform a structured array of candidates to the pslist matrix
+"""
+
+import numpy as np
+
+CANDIDATE_DTYPE = np.dtype([("x",np.int32),("y",np.int32),
+                            ("axis_x",np.float64),("axis_y",np.float64),
+                            ("angle",np.float64),("peak",np.float64),
+                            ("snr",np.float64),("filter_id",np.int32)])
+
+# Columns of the pslist matrix
+PSLIST_FIELDS = ("x","y","axis_x","axis_y","angle","peak","snr")
+
+def to_pslist(cand):
+    """Transform the structured candidates to the (num,7) pslist matrix"""
+    return np.column_stack([cand[field].astype(float)
+                            for field in PSLIST_FIELDS])
+
+# Defination of class
+class CandidateStore:
+    def __init__(self,chunk_size=65536):
+        self.chunk_size = chunk_size
+        self._data = np.zeros(0,dtype=CANDIDATE_DTYPE)
+        self._num = 0
+        # Whether the buffer has been handed out by to_array
+        self._shared = False
+
+    def __len__(self):
+        return self._num
+
+    def _reserve(self,num):
+        """Grow the capacity geometrically in whole chunks"""
+        capacity = len(self._data)
+        if num <= capacity:
+            return
+        capacity = max(num,capacity + capacity//2)
+        capacity = -(-capacity // self.chunk_size) * self.chunk_size
+        if self._shared:
+            # Never resize a buffer which may be viewed outside
+            data = np.zeros(capacity,dtype=CANDIDATE_DTYPE)
+            data[:self._num] = self._data[:self._num]
+            self._data = data
+            self._shared = False
+        else:
+            # Reallocate in place if possible
+            self._data.resize(capacity,refcheck=False)
+
+    def append(self,pslist,filter_id=-1):
+        """
+        Append the candidates
+
+        Parameters
+        ----------
+        pslist: np.ndarray
+            The (num,7) matrix of PeakDetector.get_pslist
+        filter_id: int
+            Index of the filter
+        """
+        pslist = np.asarray(pslist).reshape(-1,len(PSLIST_FIELDS))
+        num = pslist.shape[0]
+        self._reserve(self._num + num)
+        block = self._data[self._num:self._num+num]
+        for col,field in enumerate(PSLIST_FIELDS):
+            block[field] = pslist[:,col]
+        block["filter_id"] = filter_id
+        self._num += num
+
+    def to_array(self):
+        """Get the candidates, the spare capacity is released"""
+        if not self._shared:
+            self._data.resize(self._num,refcheck=False)
+            self._shared = True
+        return self._data[:self._num]
+
+    def to_matrix(self,rows=None):
+        """
+        Get the candidates as the pslist matrix
+
+        Parameter
+        ---------
+        rows: np.ndarray
+            Indices or mask of the candidates to output, all if None
+        """
+        data = self._data[:self._num]
+        if rows is not None:
+            data = data[rows]
+        return to_pslist(data)
@@ -0,0 +1,140 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Design of a class namely Convolver, the convolution engine shared by all
+the filters applied to one image.
+
+Parameters
+----------
+imgmat: np.ndarray
+    Two dimensional image matrix
+mode: str
+    Convolution mode, can be 'auto','direct','fft' or 'oa'
+kernel_shape: tuple
+    The largest kernel shape expected, used to pad the image only once so
+    that the spectrum can be reused by every filter.
+cache_size: int
+    Largest size in bytes of the cached image spectrum.
+cache: ResponseCache object
+    The on-disk cache of the convolved images, which are loaded instead of
+    convolved again if cached.
+
+Note
+----
+The precision follows imgmat and the kernels, a float32 image convolved
+with float32 kernels gives float32 outputs with a complex64 spectrum.
+
+Methods
+-------
+convolve:
+    Convolve the image with a kernel, equal to scipy.ndimage.convolve with
+    mode='constant' and cval=0.0
+select_mode:
+    Choose the convolution mode with respect to the kernel and image sizes
+
+References
+----------
+[1] Multidimensioanl convolution
+    http://docs.scipy.org/doc/scipy/reference/generated/scipy.ndimage.
+    convolve.html#scipy.ndimage.convolve
+[2] Overlap-add method
+    https://en.wikipedia.org/wiki/Overlap%E2%80%93add_method
+"""
+
+import numpy as np
+from scipy import fft
+from scipy.ndimage import convolve
+from scipy.signal import oaconvolve
+
+# Defination of class
+class Convolver:
+    MODES = ('auto','direct','fft','oa')
+
+    def __init__(self,imgmat,mode='auto',kernel_shape=None,
+                 cache_size=512*1024**2,cache=None):
+        if mode not in self.MODES:
+            raise ValueError("Unknown convolution mode: %s" % mode)
+        self.imgmat = imgmat
+        self.mode = mode
+        self.kernel_shape = kernel_shape
+        self.cache_size = cache_size
+        self.cache = cache
+        self._imghash = None
+        self._spectra = {}
+
+    def _get_fftshape(self,kshape):
+        """Padded shape of the linear convolution with a kernel"""
+        if self.kernel_shape is not None:
+            # All kernels not larger than the reserved one share the shape
+            kshape = tuple(max(k,r) for k,r in zip(kshape,self.kernel_shape))
+        return tuple(fft.next_fast_len(n+k-1,real=True)
+                     for n,k in zip(self.imgmat.shape,kshape))
+
+    def _get_spectrum(self,fftshape):
+        """Get the cached image spectrum, computing it at the first call"""
+        if fftshape not in self._spectra:
+            self._spectra[fftshape] = fft.rfft2(self.imgmat,s=fftshape)
+        return self._spectra[fftshape]
+
+    def select_mode(self,kshape):
+        """
+        Choose the convolution mode by comparing the operations of the
+        direct convolution O(N*K) with those of the FFT, which needs a
+        kernel transform and an inverse transform once the image spectrum
+        is cached.
+        """
+        if self.mode != 'auto':
+            return self.mode
+        fftshape = self._get_fftshape(kshape)
+        num_fft = np.prod(fftshape)
+        cost_direct = self.imgmat.size * np.prod(kshape)
+        cost_fft = 2 * num_fft * np.log2(num_fft)
+        if cost_direct <= cost_fft:
+            return 'direct'
+        # complex spectrum of a real input
+        itemsize = np.result_type(self.imgmat.dtype,np.complex64).itemsize
+        bytes_spec = num_fft // fftshape[-1] * (fftshape[-1]//2+1) * itemsize
+        if bytes_spec > self.cache_size:
+            return 'oa'
+        return 'fft'
+
+    def convolve(self,psf):
+        """
+        Convolve the image with psf, zeros are padded outside the image.
+
+        Parameter
+        ---------
+        psf: np.ndarray
+            The two dimensional kernel
+        """
+        mode = self.select_mode(psf.shape)
+        if self.cache is None:
+            return self._convolve(psf,mode)
+        if self._imghash is None:
+            self._imghash = self.cache.hash_image(self.imgmat)
+        key = self.cache.get_key(self._imghash,psf,mode)
+        imgconv = self.cache.load(key)
+        if imgconv is None:
+            imgconv = self._convolve(psf,mode)
+            self.cache.save(key,imgconv)
+
+        return imgconv
+
+    def _convolve(self,psf,mode):
+        """Convolve in the mode"""
+        if mode == 'direct':
+            return convolve(self.imgmat,psf,mode='constant',cval=0.0)
+
+        rows,cols = self.imgmat.shape
+        # ndimage centers the kernel at k//2 of each axis
+        off_y = psf.shape[0] // 2
+        off_x = psf.shape[1] // 2
+        if mode == 'fft':
+            fftshape = self._get_fftshape(psf.shape)
+            spec = self._get_spectrum(fftshape) * fft.rfft2(psf,s=fftshape)
+            imgfull = fft.irfft2(spec,s=fftshape)
+        else:
+            imgfull = oaconvolve(self.imgmat,psf,mode='full')
+
+        return np.ascontiguousarray(imgfull[off_y:off_y+rows,off_x:off_x+cols])
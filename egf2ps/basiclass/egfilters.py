@@ -15,7 +15,10 @@ sigma_x,sigma_y: float
 raidus_x,radius_y: float
     The FHTM radii of the two dimensional filter
 psf: np.ndarray
-    The two dimensional mat
+    The two dimensional mat, if provided, e.g. by a FilterBank, it is
+    returned by get_filter without regeneration.
+dtype: np.dtype
+    Data type of the generated filter, np.float32 or np.float64
 
 Functions
 ---------
@@ -32,10 +35,13 @@ import numpy as np
 # Defination of class
 class EGFilter:
     # __init__
-    def __init__(self,scale = (8,8),sigma = (1,2),angle = 0):
+    def __init__(self,scale = (8,8),sigma = (1,2),angle = 0,psf = None,
+                 dtype = np.float64):
         self.scale_x,self.scale_y = scale
         self.sigma_x,self.sigma_y = sigma
         self.angle = angle
+        self.psf = psf
+        self.dtype = np.dtype(dtype)
         self._get_radius()
 
     def _get_radius(self):
@@ -54,6 +60,8 @@ class EGFilter:
         [1] Gaussian function
             https://en.wikipedia.org/wiki/Gaussian_function
         """
+        if self.psf is not None:
+            return self.psf
         # Init
         psf = np.zeros((self.scale_x+1,self.scale_y+1))
 
@@ -77,6 +85,6 @@ class EGFilter:
         A = 1 # amplitude
         psf = A * np.exp(-(a*(X**2)-2*b*X*Y+c*(Y**2)))
 
-        return psf
+        return psf.astype(self.dtype,copy=False)
 
 
@@ -0,0 +1,208 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Design of a class namely FilterBank, which holds all the elliptical Gaussian
+filters of a detection as stacked matrices.
+
+Parameters
+----------
+scales: list
+    Scales of the filters, the x and y scales are the same
+sigma_x,sigma_y: list
+    Variances of the filters along the x and y directions
+angles: list
+    Rotation angles of the filters in radian
+kernels: dict
+    Stacked kernels of each scale, with shape (num_filters,rows,cols)
+params: dict
+    The (sigma_x,sigma_y,angle) of each stacked kernel
+dtype: np.dtype
+    Data type of the kernels, which are computed in float64 and rounded
+
+Methods
+-------
+get_filters:
+    Generate EGFilter objects carrying the precomputed kernels
+get_groups:
+    Generate the stacked kernels of all angles for each (scale,sigma)
+save:
+    Save the bank to a .npz file
+load:
+    Load a bank saved by save
+share:
+    Put the kernels of the bank into the process-wide cache
+match:
+    Judge whether the bank is built from the provided parameters
+
+Note
+----
+Kernels are kept in a process-wide LRU cache bounded by memory, so banks of
+the same parameters are generated only once for all images of a process.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .egfilters import EGFilter
+
+# Process-wide cache of stacked kernels
+_cache = OrderedDict()
+_cache_size = 256 * 1024**2
+
+def set_cache_size(size):
+    """
+    Set the largest memory in bytes held by the kernel cache, which is
+    process-wide and so set once by the entry points, not by each Detector
+    """
+    global _cache_size
+    if size == _cache_size:
+        return
+    _cache_size = size
+    _evict()
+
+def _evict():
+    """Drop the least recently used kernels until the cache fits"""
+    nbytes = sum(kernels.nbytes for kernels in _cache.values())
+    while _cache and nbytes > _cache_size:
+        key,kernels = _cache.popitem(last=False)
+        nbytes -= kernels.nbytes
+
+def get_kernels(scale,params,dtype=np.float64):
+    """
+    Generate the stacked kernels of one scale, with the same formula
+    of EGFilter.get_filter but vectorized over all the parameters.
+
+    Parameters
+    ----------
+    scale: int
+        Scale of the filters
+    params: np.ndarray
+        A (num_filters,3) matrix of (sigma_x,sigma_y,angle)
+    dtype: np.dtype
+        Data type of the kernels
+    """
+    half = int(np.round(scale/2))
+    x = np.arange(-half,half+1,1)
+    [X,Y] = np.meshgrid(x,x)
+    sigma_x = params[:,0].reshape(-1,1,1)
+    sigma_y = params[:,1].reshape(-1,1,1)
+    angle = params[:,2].reshape(-1,1,1)
+    # Get a,b,c
+    a = (np.cos(angle)**2/(2*sigma_x**2) +
+         np.sin(angle)**2/(2*sigma_y**2))
+    b = (-np.sin(2*angle)**2/(4*sigma_x**2) -
+         np.cos(2*angle)**2/(4*sigma_y**2))
+    c = (np.sin(angle)**2/(2*sigma_x**2) +
+         np.cos(angle)**2/(2*sigma_y**2))
+
+    kernels = np.exp(-(a*(X**2)-2*b*X*Y+c*(Y**2)))
+
+    return kernels.astype(dtype,copy=False)
+
+# Defination of class
+class FilterBank:
+    def __init__(self,scales,sigma_x,sigma_y,angles,dtype=np.float64):
+        self.scales = [int(s) for s in scales]
+        self.sigma_x = np.asarray(sigma_x,dtype=float)
+        self.sigma_y = np.asarray(sigma_y,dtype=float)
+        self.angles = np.asarray(angles,dtype=float)
+        self.dtype = np.dtype(dtype)
+        self.kernels = {}
+        self.params = {}
+        self._get_params()
+
+    def _get_params(self):
+        """Get (sigma_x,sigma_y,angle) in the order of the detection loops"""
+        grid = np.meshgrid(self.sigma_x,self.sigma_y,self.angles,
+                           indexing='ij')
+        params = np.column_stack([g.ravel() for g in grid])
+        for s in self.scales:
+            self.params[s] = params
+
+    def _get_key(self,scale):
+        """Key of the kernels in the cache"""
+        return (scale,self.sigma_x.tobytes(),self.sigma_y.tobytes(),
+                self.angles.tobytes(),self.dtype.str)
+
+    def build(self):
+        """Generate the kernels, reusing the cached ones"""
+        for s in self.scales:
+            if s in self.kernels:
+                continue
+            key = self._get_key(s)
+            kernels = _cache.get(key)
+            if kernels is None:
+                kernels = get_kernels(s,self.params[s],self.dtype)
+                _cache[key] = kernels
+                _evict()
+            else:
+                _cache.move_to_end(key)
+            self.kernels[s] = kernels
+
+        return self
+
+    def get_filters(self):
+        """Generate the EGFilters with kernels attached"""
+        self.build()
+        for s in self.scales:
+            for i,(var_x,var_y,ang) in enumerate(self.params[s]):
+                yield EGFilter(scale=(s,s),sigma=(var_x,var_y),angle=ang,
+                               psf=self.kernels[s][i],dtype=self.dtype)
+
+    def get_groups(self):
+        """
+        Generate (scale,sigma_x,sigma_y,angles,kernels) for each scale and
+        sigma, where kernels are of all the angles.
+        """
+        self.build()
+        num_ang = len(self.angles)
+        for s in self.scales:
+            for i in range(0,len(self.params[s]),num_ang):
+                var_x,var_y,_ = self.params[s][i]
+                yield (s,var_x,var_y,self.params[s][i:i+num_ang,2],
+                       self.kernels[s][i:i+num_ang])
+
+    def match(self,scales,sigma_x,sigma_y,angles,dtype=np.float64):
+        """Judge whether the bank is built from the parameters"""
+        return (list(self.scales) == [int(s) for s in scales] and
+                self.dtype == np.dtype(dtype) and
+                np.array_equal(self.sigma_x,np.asarray(sigma_x,dtype=float)) and
+                np.array_equal(self.sigma_y,np.asarray(sigma_y,dtype=float)) and
+                np.array_equal(self.angles,np.asarray(angles,dtype=float)))
+
+    def save(self,filepath):
+        """Save the bank to a .npz file"""
+        self.build()
+        arrays = {"scales": np.array(self.scales),
+                  "sigma_x": self.sigma_x,
+                  "sigma_y": self.sigma_y,
+                  "angles": self.angles,
+                  "dtype": np.array(self.dtype.str)}
+        for s in self.scales:
+            arrays["kernels_%d" % s] = self.kernels[s]
+        np.savez(filepath,**arrays)
+
+    @classmethod
+    def load(cls,filepath):
+        """Load a bank from the .npz file, and fill the cache with it"""
+        with np.load(filepath) as data:
+            # Banks saved before the dtype was recorded are of float64
+            dtype = str(data["dtype"]) if "dtype" in data else np.float64
+            bank = cls(data["scales"],data["sigma_x"],data["sigma_y"],
+                       data["angles"],dtype)
+            for s in bank.scales:
+                bank.kernels[s] = data["kernels_%d" % s]
+
+        return bank.share()
+
+    def share(self):
+        """Put the kernels into the cache, e.g. in another process"""
+        for s,kernels in self.kernels.items():
+            key = self._get_key(s)
+            _cache[key] = kernels
+            _cache.move_to_end(key)
+        _evict()
+
+        return self
@@ -0,0 +1,45 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Design of a class namely IntegralImage, the summed-area table of an image,
+which is built once and answers the sum of any rectangular box in O(1).
+
+Parameters
+----------
+imgmat: np.ndarray
+    Two dimensional image matrix
+
+Methods
+-------
+box_sum:
+    Sum of the pixels in boxes, which can be vectorized
+
+References
+----------
+[1] Summed-area table
+    https://en.wikipedia.org/wiki/Summed-area_table
+"""
+
+import numpy as np
+
+# Defination of class
+class IntegralImage:
+    def __init__(self,imgmat):
+        self.shape = imgmat.shape
+        self._get_table(imgmat)
+
+    def _get_table(self,imgmat):
+        """Get the table padded with a zero row and column"""
+        rows,cols = self.shape
+        self.table = np.zeros((rows+1,cols+1))
+        np.cumsum(imgmat,axis=0,out=self.table[1:,1:])
+        np.cumsum(self.table[1:,1:],axis=1,out=self.table[1:,1:])
+
+    def box_sum(self,y0,y1,x0,x1):
+        """
+        Sum of imgmat[y0:y1,x0:x1], the bounds can be integers or arrays
+        and should be inside [0,rows] and [0,cols].
+        """
+        t = self.table
+        return t[y1,x1] - t[y0,x1] - t[y1,x0] + t[y0,x0]
@@ -10,15 +10,44 @@ img_mat: np.ndarray
     Two dimensional image matrix
 egfilter:EGFilter object
     The elliptical Gaussian filter
+convolver: Convolver object
+    The convolution engine holding the image spectrum, which can be shared
+    by the PeakDetectors of the same image. A new one is created if None.
+imgsmooth: np.ndarray
+    The smoothed image if already computed, e.g. by a SteerableFilter, then
+    smooth does not convolve again.
+integral: IntegralImage object
+    The summed-area table of img_mat, which can be shared by the
+    PeakDetectors of the same image. A new one is created if None.
+norm_range: tuple
+    The (min,max) to normalize the smoothed image, e.g. those of the whole
+    image when a tile is processed. The extrema of imgsmooth if None.
+threshold: float
+    Threshold of the normalized peaks, peaks/threshold if None
 
 Methods
 -------
 smooth:
     Convolve the img_mat with egfilter
+normalize:
+    Normalize the smoothed image, which is kept, so the peaks can be
+    located again with another threshold without smoothing
 locate_peaks:
-    Detect peaks and output peaklist
+    Detect peaks and output peaklist, the method is set by peaks/method,
+    'greedy' gives the same peaks as the iterative search of the global
+    maximum, 'nms' only takes the local maxima as candidates.
+get_candidates:
+    Get the candidates of the peaks before the suppression
 save_peaks:
     Save peaks to csv files
+get_stats:
+    Get the parameters of the filter, the number of peaks and the timings
+    in seconds of the smooth, peaks and snr steps
+
+Functions
+---------
+suppress_peaks:
+    Suppress the candidates merged from tiles as PeakDetector does
 
 References
 ----------
@@ -30,97 +59,244 @@ References
     html#scipy.ndimage.imread
 """
 
-from scipy.ndimage import convolve
+import time
+
 import numpy as np
+from scipy.ndimage import maximum_filter
 
-from .pointsource import PointSource
+from .pointsource import compute_snr
+from .convolver import Convolver
+from .integralimage import IntegralImage
 from ..utils import utils
 
+def suppress_peaks(values,cord_x,cord_y,neighbors):
+    """
+    Get the indices of the peaks kept by the suppression of PeakDetector,
+    whose candidates are not on an image, e.g., merged from tiles. The
+    peaks taken are hashed by cells of the window size, so only the
+    adjacent cells are searched.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        The normalized peaks of the candidates
+    cord_x,cord_y: np.ndarray
+        Cores of the candidates
+    neighbors: int
+        Half size of the suppression window, see PeakDetector
+
+    Returns
+    -------
+    keep: np.ndarray
+        Indices of the peaks in the order taken, i.e., that of the peaklist
+        of the whole image
+    """
+    n = int(neighbors)
+    size = 2*n + 1
+    # The same order as the flat indices of an image
+    order = np.lexsort((cord_x,cord_y,-values))
+    cord_x = np.asarray(cord_x,dtype=int)
+    cord_y = np.asarray(cord_y,dtype=int)
+    cells = {}
+    keep = []
+    pending = []
+    for k,i in enumerate(order):
+        x,y = cord_x[i],cord_y[i]
+        cx,cy = x // size,y // size
+        suppressed = False
+        for key in ((cx+dx,cy+dy) for dy in (-1,0,1) for dx in (-1,0,1)):
+            for px,py in cells.get(key,()):
+                # The window of suppress
+                if py-1-n <= y < py+n and px-n <= x < px+n:
+                    suppressed = True
+                    break
+            if suppressed:
+                break
+        if not suppressed:
+            keep.append(i)
+            pending.append((x,y))
+        # Suppress after the last candidate of the same value
+        if k == len(order)-1 or values[order[k+1]] != values[i]:
+            for px,py in pending:
+                cells.setdefault((px // size,py // size),[]).append((px,py))
+            pending = []
+
+    return np.array(keep,dtype=int)
+
 # Defination of class
 class PeakDetector():
-    def __init__(self,Configs,imgmat,egfilter):
+    def __init__(self,Configs,imgmat,egfilter,convolver=None,imgsmooth=None,
+                 integral=None,norm_range=None,threshold=None):
         """Initialization of parameters"""
         self.Configs = Configs
         self.imgmat = imgmat
         self.egfilter = egfilter
+        self.imgsmooth = imgsmooth
+        self.imgnorm = None
         self.peaklist = []
+        self.timings = dict(smooth=0.0,peaks=0.0,snr=0.0)
         self._get_configs()
+        if threshold is not None:
+            self.threshold = threshold
+        if convolver is None:
+            convolver = Convolver(imgmat,mode=self.conv_mode)
+        self.convolver = convolver
+        if integral is None:
+            integral = IntegralImage(imgmat)
+        self.integral = integral
+        self.norm_range = norm_range
 
     def _get_configs(self):
         """Get configurations from the Configs"""
         self.threshold = self.Configs.getn_value("peaks/threshold")
+        self.conv_mode = self.Configs.getn_value("runtime/conv_mode")
+        self.method = self.Configs.getn_value("peaks/method")
 
     def smooth(self):
         """
         Smooth the image to improve significant of the point sources with
         respect to the parameters of the egfilter.
         """
+        if self.imgsmooth is not None:
+            return
+        start = time.perf_counter()
         psf = self.egfilter.get_filter()
         # Convolve
-        imgsmooth = convolve(self.imgmat,psf,mode='constant',cval=0.0)
+        imgsmooth = self.convolver.convolve(psf)
         self.imgsmooth = imgsmooth
+        self.timings["smooth"] += time.perf_counter() - start
 
-    def locate_peaks(self):
-        """Locate peaks with respect to the threshold"""
+    def normalize(self):
+        """Normalize the smoothed image, only once"""
+        if self.imgnorm is not None:
+            return
         # Smooth
         self.smooth()
-        # Init
+        start = time.perf_counter()
+        if self.norm_range is None:
+            max_value = self.imgsmooth.max()
+            min_value = self.imgsmooth.min()
+        else:
+            min_value,max_value = self.norm_range
+        # Keep the precision of the smoothed image
+        dtype = np.result_type(self.imgsmooth.dtype,np.float32)
+        min_value,max_value = np.asarray((min_value,max_value),dtype=dtype)
+        self.imgnorm = (self.imgsmooth - min_value)/(max_value-min_value)
+        self.timings["peaks"] += time.perf_counter() - start
+
+    def _find_candidates(self):
+        """Flat indices of the candidate peaks, before the suppression"""
+        self.normalize()
+        self.neighbors = max(self.egfilter.scale_x,self.egfilter.scale_y)
+        imgnorm = self.imgnorm
+        if self.method == 'nms':
+            size = 2*self.neighbors+1
+            imgmax = maximum_filter(imgnorm,size=size,mode='constant',
+                                    cval=-np.inf)
+            mask = (imgnorm == imgmax) & (imgnorm >= self.threshold)
+        else:
+            mask = imgnorm >= self.threshold
+
+        return np.flatnonzero(mask)
+
+    def locate_peaks(self):
+        """Locate peaks with respect to the threshold"""
+        self.normalize()
+        start = time.perf_counter()
+        cand = self._find_candidates()
+        self.peaklist = self._suppress(self.imgnorm,cand)
+        self.timings["peaks"] += time.perf_counter() - start
+
+    def get_candidates(self):
+        """
+        Get the pslist of the candidate peaks before the suppression, whose
+        snr are NaN, e.g., the candidates of tiles suppressed together by
+        suppress_peaks.
+        """
+        self.normalize()
+        start = time.perf_counter()
+        cand = self._find_candidates()
+        cord_y,cord_x = np.divmod(cand,self.imgnorm.shape[1])
+        pslist = self._to_pslist([self.imgnorm.ravel()[cand],cord_x,cord_y])
+        pslist[:,6] = np.nan
+        self.timings["peaks"] += time.perf_counter() - start
+
+        return pslist
+
+    def _suppress(self,imgnorm,cand):
+        """
+        Take the candidates from the highest, and discard those in the
+        neighborhood of a higher peak taken before. Candidates of the same
+        value are taken together, which is the same as zeroing the window
+        around each found global maximum.
+
+        Parameters
+        ----------
+        imgnorm: np.ndarray
+            The normalized smoothed image
+        cand: np.ndarray
+            Flat indices of the candidates in row-major order
+        """
+        rows,cols = imgnorm.shape
+        n = self.neighbors
+        values = imgnorm.ravel()[cand]
+        order = np.argsort(-values,kind='stable')
+        cand = cand[order]
+        values = values[order]
+        suppressed = np.zeros((rows,cols),dtype=bool)
         peaks = []
         cord_x = []
         cord_y = []
-        rows,cols = self.imgsmooth.shape
-        self.neighbors = max(self.egfilter.scale_x,self.egfilter.scale_y)
-        # Normalize
-        max_value = self.imgsmooth.max()
-        min_value = self.imgsmooth.min()
-        imgnorm = (self.imgsmooth - min_value)/(max_value-min_value)
-        self.imgnorm = imgnorm.copy()
-        # Find peaks
-        flag = 1
-        while flag == 1:
-            peak_max = imgnorm.max()
-            if peak_max >= self.threshold:
-                peak_y,peak_x = np.where(imgnorm==peak_max)
-                for i in range(len(peak_x)):
-                    # Judge and fill
-                    mask_x = np.arange(peak_x[i]-self.neighbors,peak_x[i]+self.neighbors+1,1)
-                    mask_y = np.arange(peak_y[i]-1-self.neighbors,peak_y[i]+self.neighbors+1,1)
-                    x_b = np.where(mask_x>=0)[0][0]
-                    x_e = np.where(mask_x<=cols)[0][-1]
-                    y_b = np.where(mask_y>=0)[0][0]
-                    y_e = np.where(mask_y<=rows)[0][-1]
-                    imgnorm[mask_y[y_b]:mask_y[y_e],mask_x[x_b]:mask_x[x_e]] *= 0.0
-                    # append
-                    peaks.append(peak_max)
-                    cord_x.append(peak_x[i])
-                    cord_y.append(peak_y[i])
-            else:
-                flag = 0
-
-        self.peaklist = [peaks,cord_x,cord_y]
+        pending = []
+        for i in range(len(cand)):
+            peak_y,peak_x = divmod(int(cand[i]),cols)
+            if not suppressed[peak_y,peak_x]:
+                pending.append((peak_x,peak_y))
+                peaks.append(values[i])
+                cord_x.append(peak_x)
+                cord_y.append(peak_y)
+            # Suppress after the last candidate of the same value
+            if i == len(cand)-1 or values[i+1] != values[i]:
+                for peak_x,peak_y in pending:
+                    suppressed[max(peak_y-1-n,0):min(peak_y+n,rows),
+                               max(peak_x-n,0):min(peak_x+n,cols)] = True
+                pending = []
+
+        return [peaks,cord_x,cord_y]
+
+    def _to_pslist(self,peaklist):
+        """Get the pslist of the [peaks,cord_x,cord_y], without the snr"""
+        pslist = np.zeros((len(peaklist[0]),7))
+        pslist[:,0] = peaklist[1]
+        pslist[:,1] = peaklist[2]
+        pslist[:,2] = self.egfilter.radius_x
+        pslist[:,3] = self.egfilter.radius_y
+        pslist[:,4] = self.egfilter.angle / np.pi * 180
+        pslist[:,5] = peaklist[0]
 
+        return pslist
 
     def get_pslist(self):
         """Get potential point source list
         """
         # Get peaklist
         self.locate_peaks()
-        # Init
-        pslist = []
-        numps = len(self.peaklist[0])
-        # Gen pslist
-        radius_x = self.egfilter.radius_x
-        radius_y = self.egfilter.radius_y
-        angle = self.egfilter.angle / np.pi * 180
-        for i in range(numps):
-            ps = PointSource(core=(self.peaklist[1][i],self.peaklist[2][i]),
-                             axis=(radius_x,radius_y),peak=self.peaklist[0][i],
-                            ang = angle)
-            snr = ps.get_snr(self.imgmat)
-
-            ps_temp = ps.get_ps()
-            ps_temp.append(snr)
-            pslist.append(ps_temp)
-
-
-        return np.array(pslist)
\ No newline at end of file
+        pslist = self._to_pslist(self.peaklist)
+        # snr of all the peaks at once
+        start = time.perf_counter()
+        pslist[:,6] = compute_snr(self.imgmat,pslist[:,0:2],pslist[:,2:4],
+                                  pslist[:,4],self.integral)
+        self.timings["snr"] += time.perf_counter() - start
+
+        return pslist
+
+    def get_stats(self):
+        """Get the statistics of the filter"""
+        stats = dict(scale=int(self.egfilter.scale_x),
+                     sigma_x=float(self.egfilter.sigma_x),
+                     sigma_y=float(self.egfilter.sigma_y),
+                     angle=float(self.egfilter.angle / np.pi * 180),
+                     num_peaks=len(self.peaklist[0]) if self.peaklist else 0)
+        stats.update(self.timings)
+
+        return stats
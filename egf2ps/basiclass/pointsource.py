@@ -16,9 +16,19 @@ ps: list
     | axis_y    | axis       |
     | peak      | peak       |
 
+Functions
+---------
+compute_snr:
+    Calculate the signal-to-noise ratios of a batch of point sources, which
+    is the vectorized form of PointSource.get_snr.
 """
 import numpy as np
 
+from .integralimage import IntegralImage
+
+# Largest number of pixels gathered at once by compute_snr
+CHUNK_PIXELS = 2**22
+
 # Defination of point source class
 class PointSource:
 
@@ -72,8 +82,18 @@ class PointSource:
 
         return power,area
 
-    def get_snr(self,img_mat):
-        """Calculate signal-to-noise ratio"""
+    def get_snr(self,img_mat,integral=None):
+        """
+        Calculate signal-to-noise ratio
+
+        Parameters
+        ----------
+        img_mat: np.ndarray
+            The image
+        integral: IntegralImage object
+            The summed-area table of img_mat, if provided, the neighbor
+            region is summed from it instead of the pixels.
+        """
         # Init
         rows,cols = img_mat.shape
         # get indices
@@ -88,10 +108,14 @@ class PointSource:
         y_b = np.where(y>=0)[0][0]
         y_e = np.where(y<=rows)[0][-1]
         # get region
-        region = img_mat[y[y_b]:y[y_e],x[x_b]:x[x_e]]
+        if integral is None:
+            region = img_mat[y[y_b]:y[y_e],x[x_b]:x[x_e]]
+            power_region = np.sum(region)
+        else:
+            power_region = integral.box_sum(y[y_b],y[y_e],x[x_b],x[x_e])
         power_ps,area = self.get_power(img_mat)
         # Power of neighbor
-        power_nb = np.sum(region)- power_ps
+        power_nb = power_region - power_ps
         # Average power of bkg
         bkg_avg =  power_nb/((x[x_e]-x[x_b]+1)*(y[y_e]-y[y_b]+1) - area)
         power_bkg = bkg_avg * area
@@ -99,3 +123,90 @@ class PointSource:
         snr = 20*np.log10(power_ps/power_bkg)
 
         return snr
+
+
+def _get_stencil(axis_x,axis_y,ang):
+    """
+    Get the offsets of the pixels inside the ellipse, with the same rule
+    of PointSource.get_power.
+    """
+    ps = PointSource(axis=(axis_x,axis_y),ang=ang)
+    sp = int(max(round(axis_x),round(axis_y)))
+    x = np.arange(-sp,sp+1,1)
+    [i,j] = np.meshgrid(x,x)
+    d = (np.sqrt((i-ps.f1[0])**2 + (j-ps.f1[1])**2) +
+         np.sqrt((i-ps.f2[0])**2+(j-ps.f2[1])**2))
+    mask = d <= 2*sp
+
+    return i[mask],j[mask],sp
+
+def compute_snr(img_mat,cores,axes,angles,integral=None):
+    """
+    Calculate signal-to-noise ratios of the point sources, the results are
+    the same as PointSource.get_snr.
+
+    Parameters
+    ----------
+    img_mat: np.ndarray
+        The image
+    cores: np.ndarray
+        A (num_ps,2) matrix of the (core_x,core_y)
+    axes: np.ndarray
+        A (num_ps,2) matrix of the (axis_x,axis_y)
+    angles: np.ndarray
+        Angles of the point sources, the same as PointSource.ang
+    integral: IntegralImage object
+        The summed-area table of img_mat, built here if None
+
+    Returns
+    -------
+    snr: np.ndarray
+        The signal-to-noise ratios
+
+    Note
+    ----
+    The pixels of the ellipse are gathered with precomputed offsets of each
+    (axis,angle), and the neighbor regions are summed with a summed-area
+    table. Pixels out of the image are not counted.
+    """
+    rows,cols = img_mat.shape
+    cores = np.asarray(cores,dtype=int).reshape(-1,2)
+    axes = np.asarray(axes,dtype=float).reshape(-1,2)
+    angles = np.asarray(angles,dtype=float).reshape(-1)
+    num_ps = cores.shape[0]
+    power_ps = np.zeros(num_ps)
+    area = np.zeros(num_ps,dtype=int)
+    sp = np.zeros(num_ps,dtype=int)
+    # Power of the point sources, grouped by the stencils
+    shapes = np.column_stack((axes,angles))
+    keys,inverse = np.unique(shapes,axis=0,return_inverse=True)
+    for k,(axis_x,axis_y,ang) in enumerate(keys):
+        idx = np.where(inverse.reshape(-1) == k)[0]
+        off_x,off_y,sp[idx] = _get_stencil(axis_x,axis_y,ang)
+        step = max(CHUNK_PIXELS // max(len(off_x),1),1)
+        for b in range(0,len(idx),step):
+            sub = idx[b:b+step]
+            x = cores[sub,0:1] + off_x
+            y = cores[sub,1:2] + off_y
+            valid = ((x >= 1) & (x <= cols-1) & (y >= 1) & (y <= rows-1))
+            pixels = img_mat[np.where(valid,y,0),np.where(valid,x,0)]
+            # Accumulated in float64 whatever the precision of the image
+            power_ps[sub] = np.sum(np.where(valid,pixels,0),axis=1,
+                                   dtype=np.float64)
+            area[sub] = np.sum(valid,axis=1)
+    # Power of the neighbor regions
+    if integral is None:
+        integral = IntegralImage(img_mat)
+    sp = 2*sp
+    x0 = np.maximum(cores[:,0]-1-sp,0)
+    x1 = np.minimum(cores[:,0]+sp-1,cols)
+    y0 = np.maximum(cores[:,1]-1-sp,0)
+    y1 = np.minimum(cores[:,1]+sp-1,rows)
+    power_nb = integral.box_sum(y0,y1,x0,x1) - power_ps
+    # snr
+    with np.errstate(divide='ignore',invalid='ignore'):
+        bkg_avg = power_nb/((x1-x0+1)*(y1-y0+1) - area)
+        power_bkg = bkg_avg * area
+        snr = 20*np.log10(power_ps/power_bkg)
+
+    return snr
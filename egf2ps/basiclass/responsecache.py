@@ -0,0 +1,134 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Design of a class namely ResponseCache, an on-disk cache of the smoothed
+images, so that re-runs of the same image, e.g., with other thresholds,
+skip the convolutions.
+
+The responses are content addressed, i.e., a response is saved as
+<key>.npy in the directory, where the key is the hash of the image, the
+kernel and the convolution mode. Files are loaded as copy-on-write memory
+maps. When the directory exceeds the size bound, the least recently used
+files are removed until it is below LOW_WATER of the bound, so the
+directory is not scanned at every save.
+
+Parameters
+----------
+cache_dir: str
+    Directory of the cached responses
+cache_size: int
+    Largest size in bytes of the directory
+
+Methods
+-------
+hash_image:
+    Get the digest of an image
+get_key:
+    Get the key of the response of an image to a kernel
+load:
+    Load a cached response, None if missed
+save:
+    Save a response and evict the old ones
+"""
+
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+
+# Fraction of the size bound kept after an eviction
+LOW_WATER = 0.8
+
+def _digest(arr):
+    """Digest of an array with its shape and dtype"""
+    arr = np.ascontiguousarray(arr)
+    sha = hashlib.sha1()
+    sha.update(("%s%s" % (arr.shape,arr.dtype.str)).encode())
+    sha.update(arr.data)
+    return sha.hexdigest()
+
+# Defination of class
+class ResponseCache:
+    def __init__(self,cache_dir,cache_size=1024**3):
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir,exist_ok=True)
+        # Size of the directory, updated by the saves of this process
+        self._total = sum(size for _,size,_ in self._get_entries())
+
+    @staticmethod
+    def hash_image(imgmat):
+        """Get the digest of the image"""
+        return _digest(imgmat)
+
+    @staticmethod
+    def get_key(imghash,psf,mode):
+        """Get the key of the response of the image to psf in mode"""
+        sha = hashlib.sha1()
+        sha.update(("%s%s" % (imghash,mode)).encode())
+        sha.update(_digest(psf).encode())
+        return sha.hexdigest()
+
+    def _get_path(self,key):
+        return os.path.join(self.cache_dir,key + '.npy')
+
+    def load(self,key):
+        """Load the response, and mark it as recently used"""
+        path = self._get_path(key)
+        try:
+            response = np.load(path,mmap_mode='c')
+            os.utime(path)
+        except (IOError,ValueError):
+            # Missing, or removed by another process
+            return None
+
+        return response
+
+    def save(self,key,response):
+        """Save the response atomically, then evict the old files"""
+        nbytes = response.nbytes
+        if nbytes > self.cache_size:
+            return
+        fd,tmppath = tempfile.mkstemp(suffix='.tmp',dir=self.cache_dir)
+        try:
+            with os.fdopen(fd,'wb') as fp:
+                np.save(fp,response)
+            os.replace(tmppath,self._get_path(key))
+        except BaseException:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+            raise
+        self._total += nbytes
+        if self._total > self.cache_size:
+            self._evict()
+
+    def _get_entries(self):
+        """Get (mtime,size,path) of the cached files"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.npy'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime,stat.st_size,entry.path))
+
+        return entries
+
+    def _evict(self):
+        """Remove the least recently used files down to the low water"""
+        entries = self._get_entries()
+        total = sum(size for _,size,_ in entries)
+        for mtime,size,path in sorted(entries):
+            if total <= self.cache_size * LOW_WATER:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total = total
@@ -0,0 +1,86 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Design of a class namely SteerableFilter, which approximates the rotated
+elliptical Gaussian kernels of one (scale,sigma_x,sigma_y) by a small basis.
+
+The kernels of all angles are stacked and decomposed by SVD, each kernel is
+then a linear combination of the leading basis kernels. The image is
+convolved once with every basis kernel, and the response of any angle is a
+weighted sum of the basis responses instead of a full 2D convolution.
+
+Parameters
+----------
+kernels: np.ndarray
+    Stacked kernels of all angles, with shape (num_angles,rows,cols)
+tol: float
+    Largest relative error of the approximated kernels, with respect to the
+    L2 norm, used to decide the rank of the basis.
+
+Methods
+-------
+get_responses:
+    Generate the smoothed images of all angles
+
+References
+----------
+[1] Freeman, W. T., and Adelson, E. H.
+    "The design and use of steerable filters",
+    IEEE TPAMI, 1991, 13(9): 891-906.
+[2] Perona, P.
+    "Deformable kernels for early vision",
+    IEEE TPAMI, 1995, 17(5): 488-499.
+"""
+
+import numpy as np
+
+# Defination of class
+class SteerableFilter:
+    def __init__(self,kernels,tol=1e-3):
+        self.kernels = kernels
+        self.tol = tol
+        self._get_basis()
+
+    def _get_basis(self):
+        """Get the basis kernels and the weights of each angle"""
+        num,rows,cols = self.kernels.shape
+        mat = self.kernels.reshape(num,-1)
+        u,s,vt = np.linalg.svd(mat,full_matrices=False)
+        norms = np.linalg.norm(mat,axis=1)
+        # The smallest rank meeting the tolerance
+        for rank in range(1,len(s)+1):
+            approx = (u[:,:rank]*s[:rank]).dot(vt[:rank])
+            errors = np.linalg.norm(mat-approx,axis=1)/norms
+            if errors.max() <= self.tol:
+                break
+        self.rank = rank
+        self.errors = errors
+        self.error = errors.max()
+        self.weights = u[:,:rank]*s[:rank]
+        self.basis = vt[:rank].reshape(rank,rows,cols)
+
+    def get_responses(self,convolver):
+        """
+        Generate the smoothed image of each angle
+
+        Parameter
+        ---------
+        convolver: Convolver object
+            The convolution engine of the image
+
+        Note
+        ----
+        The rank basis responses are held until the last angle, i.e. rank
+        times the memory of the image besides the yielded response. They are
+        filled basis by basis, so no other copy of the stack is made.
+        """
+        resp_basis = None
+        for i,b in enumerate(self.basis):
+            resp = convolver.convolve(b)
+            if resp_basis is None:
+                resp_basis = np.empty((self.rank,)+resp.shape,resp.dtype)
+            resp_basis[i] = resp
+            del resp
+        for w in self.weights:
+            yield np.tensordot(w,resp_basis,axes=1)
@@ -6,3 +6,5 @@ Initialize the point sources detector
 """
 
 from .detector import Detector
+from .batch import BatchRunner
+from .sweep import ThresholdSweep
@@ -0,0 +1,183 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+A class namely BatchRunner is designed to detect point sources of many
+images with the same configurations.
+
+The filter bank is built once and shared by a pool of worker processes,
+each of which detects an image and writes its region file. A progress
+ledger records the finished images line by line in JSON, so that an
+interrupted batch resumes without detecting them again.
+
+Parameters
+----------
+Configs: Configs object
+    The configurations, input/imgpath is replaced by the images
+images: list
+    Paths of the images
+workers: int
+    Number of processes, 0 for all the CPUs
+ledger: str
+    Path of the progress ledger, default as progress.jsonl in output/dirname
+
+Methods
+-------
+get_images:
+    Get image paths from a manifest file as '@<path>' or a glob pattern
+get_regpath:
+    Get the path of the region file of an image
+run:
+    Detect the images which are not finished
+"""
+
+import os
+import glob
+import json
+import time
+import hashlib
+from collections import Counter
+from multiprocessing import Pool
+
+from ..basiclass import filterbank
+from .detector import Detector
+
+# States of a worker process
+_worker = {}
+
+def get_images(source):
+    """
+    Get image paths from a manifest file given as '@<path>', one path per
+    line and lines beginning with '#' are ignored, or from a glob pattern,
+    which may be the path of a single image of any type.
+    """
+    if source.startswith('@'):
+        with open(source[1:]) as fp:
+            lines = [line.strip() for line in fp]
+        return [line for line in lines if line and not line.startswith('#')]
+
+    return sorted(glob.glob(source))
+
+def _init_worker(Configs,bank):
+    """Put the shared filter bank into the cache of the worker"""
+    _worker["Configs"] = Configs
+    bank_cache = Configs.getn_value('runtime/bank_cache_mb')
+    filterbank.set_cache_size(bank_cache * 1024**2)
+    bank.share()
+
+def _run_image(args):
+    """Detect an image and save the region file"""
+    imgpath,regpath,workers = args
+    record = {"image": imgpath, "regpath": regpath}
+    start = time.time()
+    try:
+        detector = Detector(_worker["Configs"],imgpath=imgpath)
+        detector.save = False
+        if workers is not None:
+            detector.workers = workers
+        pslist = detector.get_final()
+        detector.save_pslist(pslist,regpath)
+        record["status"] = "done"
+        record["num_ps"] = int(pslist.shape[0])
+    except (Exception,SystemExit) as e:
+        record["status"] = "failed"
+        record["error"] = "%s: %s" % (type(e).__name__,e)
+    record["time"] = time.time() - start
+
+    return record
+
+# Defination of class
+class BatchRunner:
+    def __init__(self,Configs,images,workers=1,ledger=None):
+        self.Configs = Configs
+        self.images = images
+        self.workers = workers
+        self.dirname = self.Configs.getn_value('output/dirname')
+        if ledger is None:
+            ledger = os.path.join(self.dirname,'progress.jsonl')
+        self.ledger = ledger
+        # Names shared by images of different directories
+        names = Counter(self._get_name(img) for img in
+                        set(os.path.abspath(img) for img in images))
+        self._shared = set(name for name,num in names.items() if num > 1)
+
+    @staticmethod
+    def _get_name(imgpath):
+        return os.path.splitext(os.path.basename(imgpath))[0]
+
+    def get_regpath(self,imgpath):
+        """
+        Path of the region file of an image, named as the image. If other
+        images of the batch have the same name, a short hash of the full
+        path is appended, e.g., img_1a2b3c4d.reg, so they don't overwrite
+        each other.
+        """
+        name = self._get_name(imgpath)
+        if name in self._shared:
+            digest = hashlib.sha1(os.path.abspath(imgpath).encode())
+            name += '_' + digest.hexdigest()[:8]
+        return os.path.join(self.dirname,name + '.reg')
+
+    def get_finished(self):
+        """Get the images finished in the ledger"""
+        finished = set()
+        if not os.path.exists(self.ledger):
+            return finished
+        with open(self.ledger) as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line broken by the interruption
+                    continue
+                if record.get("status") == "done":
+                    finished.add(record["image"])
+                else:
+                    finished.discard(record["image"])
+
+        return finished
+
+    def run(self):
+        """
+        Detect the images not finished yet
+
+        Returns
+        -------
+        records: list
+            Records of the images detected in this run
+        """
+        finished = self.get_finished()
+        todo = [img for img in self.images if img not in finished]
+        records = []
+        if len(todo) == 0:
+            return records
+        # Build the filters once for all the images
+        bank = Detector(self.Configs).get_filterbank()
+        workers = self.workers or os.cpu_count()
+        # Workers of a pool can't make their own pools
+        det_workers = 1 if workers > 1 else None
+        tasks = []
+        for imgpath in todo:
+            tasks.append((imgpath,self.get_regpath(imgpath),det_workers))
+        if not os.path.exists(self.dirname):
+            os.makedirs(self.dirname)
+        with open(self.ledger,'a') as ledger:
+            if workers > 1:
+                pool = Pool(workers,initializer=_init_worker,
+                            initargs=(self.Configs,bank))
+                results = pool.imap_unordered(_run_image,tasks)
+            else:
+                pool = None
+                _init_worker(self.Configs,bank)
+                results = map(_run_image,tasks)
+            try:
+                for record in results:
+                    ledger.write(json.dumps(record) + '\n')
+                    ledger.flush()
+                    records.append(record)
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+        return records
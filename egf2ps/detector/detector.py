@@ -6,26 +6,83 @@ A class namely Detector is designed to detect and extract results
 
 Methods
 -------
-
+get_candidates:
+    Detect the candidates of all filters
+get_potential:
+    Get the potential point sources
+get_final:
+    Discard the false detections and cluster the point sources
+retune:
+    Get the final point sources of other thresholds from the candidates
+    kept in memory, see the session configs
+get_performance:
+    Compare the point sources with the reference
 """
 
 import os
+import logging
+from itertools import groupby
+
 import numpy as np
 
 from ..utils import utils
-from ..basiclass import EGFilter
+from ..utils.profiler import Profiler
+from . import parallel
+from . import tiling
 from ..basiclass import PeakDetector
+from ..basiclass import Convolver
+from ..basiclass import FilterBank
+from ..basiclass import EGFilter
+from ..basiclass import SteerableFilter
+from ..basiclass import IntegralImage
+from ..basiclass import compute_snr
+from ..basiclass import CandidateStore
+from ..basiclass import to_pslist
+from ..basiclass import ResponseCache
+
+logger = logging.getLogger(__name__)
 
 class Detector:
-    def __init__(self,Configs):
+    def __init__(self,Configs,imgpath=None):
         self.Configs = Configs
         self._get_configs()
+        # The image can be set other than input/imgpath, e.g. by batches
+        if imgpath is not None:
+            self.imgpath = imgpath
+        # Timings and counters of the stages and filters
+        self.profiler = Profiler()
+        # On-disk cache of the smoothed images, shared by the convolvers
+        self.response_cache = None
+        if self.cache_dir != "":
+            self.response_cache = ResponseCache(self.cache_dir,
+                                                self.cache_mb * 1024**2)
+        # Peak threshold of the PeakDetectors, peaks/threshold if None
+        self.peak_floor = None
+        # Candidates and PeakDetectors kept by retune
+        self.retained = None
+        self._retained_detectors = None
 
     def _get_configs(self):
         """Get configurations from configs"""
         # Input
         self.imgpath = self.Configs.getn_value('input/imgpath')
         self.refpath = self.Configs.getn_value('input/refpath')
+        self.hdu = self.Configs.getn_value('input/hdu')
+        self.memmap = self.Configs.getn_value('input/memmap')
+        # Events
+        self.events = self.Configs.getn_value('events/enabled')
+        self.evt_hdu = self.Configs.getn_value('events/hdu')
+        if self.evt_hdu.isdigit():
+            self.evt_hdu = int(self.evt_hdu)
+        self.evt_cols = (self.Configs.getn_value('events/xcol'),
+                         self.Configs.getn_value('events/ycol'))
+        self.evt_binsize = self.Configs.getn_value('events/binsize')
+        self.evt_ranges = (self.Configs.getn_value('events/xrange'),
+                           self.Configs.getn_value('events/yrange'))
+        self.evt_energy_col = self.Configs.getn_value('events/energy_col')
+        self.evt_energy_range = self.Configs.getn_value('events/energy_range')
+        self.evt_chunk_rows = self.Configs.getn_value('events/chunk_rows')
+        self.evt_grid = None
         # Filters
         scale_type = self.Configs.getn_value('filter/scale_type')
         if scale_type == 'custom':
@@ -39,7 +96,7 @@ class Detector:
             self.scale_x = 2 ** scale
             self.scale_y = 2 ** scale
         else:
-            print('Wrong option,the default will be set.')
+            logger.warning('Wrong option,the default will be set.')
             self.scale_x = [4,8]
             self.scale_y = [4,8]
         # variances
@@ -55,70 +112,517 @@ class Detector:
             self.sigma_x = 2 ** sigma
             self.sigma_y = 2 ** sigma
         else:
-            print('Wrong option,the default will be set.')
+            logger.warning('Wrong option,the default will be set.')
             self.sigma_x = [4,8]
             self.sigma_y = [4,8]
         # Angle
-        # angle_step = self.Configs.getn_value('filter/angle_step')
-        angle_step = 0.3
-        self.angle = np.arange(0,2*np.pi+angle_step,angle_step)
+        self.angle_step = self.Configs.getn_value('filter/angle_step')
+        self.angle_dedupe = self.Configs.getn_value('filter/angle_dedupe')
+        self.angle_coarse = self.Configs.getn_value('filter/angle_coarse')
+        if self.angle_dedupe:
+            # The filters repeat every pi
+            self.angle = np.arange(0,np.pi,self.angle_step)
+        else:
+            self.angle = np.arange(0,2*np.pi+self.angle_step,self.angle_step)
+        # Saved filter bank
+        self.bankpath = self.Configs.getn_value('filter/bankpath')
+        # Steerable mode
+        self.steerable = self.Configs.getn_value('filter/steerable')
+        self.steer_tol = self.Configs.getn_value('filter/steer_tol')
+        # Pyramid mode
+        self.pyramid = self.Configs.getn_value('filter/pyramid')
+        self.pyramid_min_scale = self.Configs.getn_value(
+            'filter/pyramid_min_scale')
 
         # Peaks
         self.threshold = self.Configs.getn_value('peaks/threshold')
 
         # Snr
         self.snrthrs = self.Configs.getn_value('snr/threshold')
+        self.snr_prune = self.Configs.getn_value('snr/prune')
+        self.min_snr = self.Configs.getn_value('snr/min_snr')
+
+        # Session
+        self.retain_threshold = self.Configs.getn_value(
+            'session/retain_threshold')
+        self.retain_responses = self.Configs.getn_value(
+            'session/retain_responses')
+
+        # Cluster
+        self.cls_dist = self.Configs.getn_value('cluster/dist')
+        self.cls_itertime = self.Configs.getn_value('cluster/itertime')
+        self.cls_method = self.Configs.getn_value('cluster/method')
+
+        # Compare
+        self.cmp_radius = self.Configs.getn_value('compare/radius')
+        self.cmp_method = self.Configs.getn_value('compare/method')
+
+        # Runtime
+        self.conv_mode = self.Configs.getn_value('runtime/conv_mode')
+        self.workers = self.Configs.getn_value('runtime/workers')
+        self.tile_size = self.Configs.getn_value('runtime/tile_size')
+        self.dtype = np.dtype(self.Configs.getn_value('runtime/precision'))
+        self.cache_dir = self.Configs.getn_value('runtime/cache_dir')
+        self.cache_mb = self.Configs.getn_value('runtime/cache_mb')
 
         # Output
         self.dirname = self.Configs.getn_value('output/dirname')
         self.save = self.Configs.getn_value('output/save')
+        self.catalog = self.Configs.getn_value('output/catalog')
+
+    def get_filterbank(self):
+        """
+        Get the filter bank, which is loaded from bankpath if it was saved
+        with the same parameters, otherwise generated and saved.
+        """
+        bank = None
+        if self.bankpath != "" and os.path.exists(self.bankpath):
+            bank = FilterBank.load(self.bankpath)
+            if not bank.match(self.scale_x,self.sigma_x,self.sigma_y,
+                              self.angle,self.dtype):
+                bank = None
+        if bank is None:
+            bank = FilterBank(self.scale_x,self.sigma_x,self.sigma_y,
+                              self.angle,self.dtype).build()
+            if self.bankpath != "":
+                bank.save(self.bankpath)
+
+        return bank
+
+    def _dedupe(self,group):
+        """Keep only the first angle of a group of circular filters"""
+        s,var_x,var_y,angles,kernels = group
+        if self.is_circular(var_x,var_y):
+            # All the angles give the same kernel
+            angles,kernels = angles[:1],kernels[:1]
+        return s,var_x,var_y,angles,kernels
+
+    def get_steerable(self,group):
+        """Get the SteerableFilter of a group, and record its error"""
+        s,var_x,var_y,angles,kernels = self._dedupe(group)
+        stf = SteerableFilter(kernels,tol=self.steer_tol)
+        self.steer_errors.append((s,var_x,var_y,stf.rank,stf.error))
+        logger.info("Steerable filter (scale=%d,sigma=(%g,%g)): rank %d/%d, "
+                    "error %.2e" % (s,var_x,var_y,stf.rank,len(kernels),
+                                    stf.error))
+        return stf
+
+    def _get_detectors(self,imgmat,convolver,integral,group,stf=None):
+        """
+        Generate the PeakDetector of each filter in a group of angles of
+        the same (scale,sigma_x,sigma_y). In the steerable mode, stf is the
+        SteerableFilter of the group, which is built if None.
+        """
+        s,var_x,var_y,angles,kernels = self._dedupe(group)
+        responses = [None] * len(kernels)
+        if self.steerable:
+            # The responses of angles are combined from a basis
+            if stf is None:
+                stf = self.get_steerable(group)
+            responses = stf.get_responses(convolver)
+        for ang,psf,imgsmooth in zip(angles,kernels,responses):
+            egf = EGFilter(scale=(s,s),sigma=(var_x,var_y),angle=ang,psf=psf,
+                           dtype=self.dtype)
+            yield PeakDetector(self.Configs,imgmat,egf,convolver,imgsmooth,
+                               integral,threshold=self.peak_floor)
+
+    def get_evt_grid(self):
+        """Get the binning grid of the event list, only once"""
+        if self.evt_grid is None:
+            self.evt_grid = utils.get_evt_grid(self.imgpath,self.evt_hdu,
+                                               self.evt_cols,self.evt_binsize,
+                                               self.evt_ranges,
+                                               self.evt_chunk_rows)
+        return self.evt_grid
+
+    def get_shape(self):
+        """Get the shape of the image, or of the binned events"""
+        if self.events:
+            (x0,nx),(y0,ny) = self.get_evt_grid()
+            return (ny,nx)
+        return utils.get_img_shape(self.imgpath,self.hdu)
+
+    def read_image(self,section=None):
+        """
+        Read the image, or only the cutout of section, which is a tuple
+        of slices, in the precision of runtime/precision. The events are
+        binned on the fly if events/enabled.
+        """
+        if self.events:
+            return utils.evt2mat(self.imgpath,self.evt_hdu,self.evt_cols,
+                                 self.evt_binsize,self.get_evt_grid(),
+                                 self.evt_energy_col,self.evt_energy_range,
+                                 self.evt_chunk_rows,section,self.dtype)
+        return utils.img2mat(self.imgpath,hdu=self.hdu,memmap=self.memmap,
+                             section=section,dtype=self.dtype)
+
+    def get_kernel_half(self):
+        """Get the half size of the largest kernel"""
+        return int(np.round(max(self.scale_x)/2))
+
+    def get_halo(self):
+        """
+        Get the halo of the tiles, which covers the largest kernel, and
+        the peak suppression window and the snr neighbor region of a source.
+        """
+        neighbors = max(self.scale_x)
+        radius = np.sqrt(2*np.log(10))*max(max(self.sigma_x),
+                                           max(self.sigma_y))
+        reach = 2*int(round(radius)) + 1
+        return self.get_kernel_half() + max(neighbors+1,reach)
+
+    def get_convolver(self,imgmat):
+        """Get the convolver whose spectrum is shared by all filters"""
+        half = self.get_kernel_half()
+        return Convolver(imgmat,mode=self.conv_mode,
+                         kernel_shape=(2*half+1,2*half+1),
+                         cache=self.response_cache)
+
+    def is_circular(self,var_x,var_y):
+        """Judge whether the angles of the filters are deduplicated"""
+        return self.angle_dedupe and var_x == var_y
+
+    def _get_angles_pslists(self,imgmat,convolver,integral,group,idx):
+        """Generate the pslist of the filters of angles idx in a group"""
+        s,var_x,var_y,angles,kernels = group
+        group = (s,var_x,var_y,angles[idx],kernels[idx])
+        for pd in self._get_detectors(imgmat,convolver,integral,group):
+            pslist = pd.get_pslist()
+            self.profiler.filters.append(pd.get_stats())
+            if self._retained_detectors is not None:
+                # Only the normalized smoothed image is kept
+                pd.imgsmooth = None
+                self._retained_detectors.append(pd)
+            yield pslist
+
+    def _get_group_pslists(self,imgmat,convolver,integral,group):
+        """
+        Generate the pslist of each filter in a group, and its stats. If
+        angle_coarse > 1, the coarse angles are run at first, and the fine
+        angles are only run if their nearest coarse angle finds peaks, i.e.,
+        it gives the highest peak of snr not lower than snr/min_snr within
+        a cell of the scale.
+        """
+        s,var_x,var_y,angles,kernels = group
+        idx = np.arange(len(angles))
+        step = self.angle_coarse
+        if step == 1 or self.is_circular(var_x,var_y):
+            for pslist in self._get_angles_pslists(imgmat,convolver,integral,
+                                                   group,idx):
+                yield pslist
+            return
+        coarse = idx[::step]
+        peaks = []
+        for i,pslist in zip(coarse,self._get_angles_pslists(
+                imgmat,convolver,integral,group,coarse)):
+            keep = pslist[:,6] >= self.min_snr
+            peaks.append(np.column_stack((pslist[keep][:,[0,1,5]],
+                                          np.full(keep.sum(),i))))
+            yield pslist
+        peaks = np.vstack(peaks)
+        if len(peaks) == 0:
+            # No coarse angle finds peaks
+            return
+        # The coarse angle of the highest peak in each cell
+        cells = (peaks[:,0] // s) * (imgmat.shape[0] // s + 1) + peaks[:,1] // s
+        order = np.lexsort((-peaks[:,2],cells))
+        first = np.r_[True,np.diff(cells[order]) != 0]
+        found = np.unique(peaks[order[first],3]).astype(int)
+        # The nearest coarse angle, the last ones are near the first
+        nearest = step*np.floor(idx/step+0.5).astype(int)
+        nearest[nearest >= len(idx)] = 0
+        fine = idx[(idx % step != 0) & np.isin(nearest,found)]
+        for pslist in self._get_angles_pslists(imgmat,convolver,integral,
+                                               group,fine):
+            yield pslist
+
+    def get_pslists(self,imgmat,groups):
+        """Generate the pslist of each filter in the groups"""
+        convolver = self.get_convolver(imgmat)
+        # Box sums of the snr are answered by the integral image
+        integral = IntegralImage(imgmat)
+        for group in groups:
+            for pslist in self._get_group_pslists(imgmat,convolver,integral,
+                                                  group):
+                yield pslist
+
+    def _run_groups(self,imgmat,groups):
+        """Generate the pslists of the groups by processes if configured"""
+        if self.workers != 1:
+            return parallel.get_pslists(self,imgmat,groups,self.workers)
+        return self.get_pslists(imgmat,groups)
+
+    def get_levels(self):
+        """
+        Get the pyramid level of each scale, the image of level l is
+        downsampled by 2**l, where the scale is still not smaller than
+        filter/pyramid_min_scale.
+        """
+        levels = []
+        for s in self.scale_x:
+            level = 0
+            while (s % 2**(level+1) == 0 and
+                   s // 2**(level+1) >= self.pyramid_min_scale):
+                level += 1
+            levels.append(level)
+
+        return levels
+
+    def _get_pyramid_pslists(self,imgmat):
+        """
+        Generate the pslists with each scale run on its pyramid level, the
+        cores and axes are mapped back to the full resolution.
+        """
+        pyramid = [imgmat]
+        integral = IntegralImage(imgmat)
+        for level,scales in groupby(zip(self.scale_x,self.get_levels()),
+                                    key=lambda item: item[1]):
+            while len(pyramid) <= level:
+                pyramid.append(utils.pyrdown(pyramid[-1]))
+            factor = 2**level
+            bank = FilterBank([s // factor for s,_ in scales],
+                              np.asarray(self.sigma_x)/factor,
+                              np.asarray(self.sigma_y)/factor,
+                              self.angle,self.dtype)
+            for pslist in self._run_groups(pyramid[level],bank.get_groups()):
+                if level > 0:
+                    # snr of the full resolution, as the small axes of the
+                    # level hold too few pixels
+                    pslist[:,0:4] *= factor
+                    pslist[:,6] = compute_snr(imgmat,pslist[:,0:2],
+                                              pslist[:,2:4],pslist[:,4],
+                                              integral)
+                yield pslist
+
+    def get_candidates(self,retain=False):
+        """
+        Detect potential point sources of all filters, which are returned
+        as a structured array with the filter_id of each candidate.
+
+        If retain, the candidates are extracted down to the peak threshold
+        session/retain_threshold, and kept unpruned as retained for retune.
+        """
+        # Init
+        self.steer_errors = []
+        self.retained = None
+        self._retained_detectors = None
+        shape = self.get_shape()
+        profiler = self.profiler
+        profiler.info.update(image=self.imgpath,shape=list(shape),
+                             precision=self.dtype.name,workers=self.workers,
+                             tile_size=self.tile_size,pyramid=self.pyramid,
+                             conv_mode=self.conv_mode)
+        tiled = 0 < self.tile_size < max(shape)
+        if retain:
+            floor = self.threshold
+            if self.retain_threshold is not None:
+                floor = min(floor,self.retain_threshold)
+            self.peak_floor = floor
+            if (self.retain_responses and self.workers == 1 and not tiled
+                    and not self.pyramid):
+                self._retained_detectors = []
+        if not tiled:
+            with profiler.stage("read"):
+                imgmat = self.read_image()
+        with profiler.stage("bank"):
+            if tiled or not self.pyramid:
+                groups = self.get_filterbank().get_groups()
+        if tiled:
+            # Only the tiles are read
+            pslists = tiling.get_pslists(self,shape,groups,self.tile_size,
+                                         self.workers)
+        elif self.pyramid:
+            pslists = self._get_pyramid_pslists(imgmat)
+        else:
+            pslists = self._run_groups(imgmat,groups)
+        store = CandidateStore()
+        self.snr_range = (np.inf,-np.inf)
+        try:
+            with profiler.stage("filters"):
+                for filter_id,pslist in enumerate(pslists):
+                    profiler.count("peaks_found",len(pslist))
+                    if not retain:
+                        pslist = self._prune(pslist)
+                    store.append(pslist,filter_id)
+                    profiler.count("filters_applied")
+        finally:
+            self.peak_floor = None
+        profiler.count("candidates_stored",len(store))
+        if not retain:
+            return store.to_array()
+
+        self.retained = dict(threshold=floor,cand=store.to_array(),
+                             detectors=self._retained_detectors)
+        self._retained_detectors = None
+
+        return self._select(self.retained['cand'])
+
+    def _prune(self,pslist):
+        """
+        Drop the candidates of a filter which can't survive the snr
+        threshold, see snr/prune. The range of snr of all candidates is
+        tracked, including the dropped ones.
+        """
+        snr = pslist[:,6]
+        # nan of the empty stencils is out of the range
+        valid = snr[~np.isnan(snr)]
+        if len(valid) > 0:
+            self.snr_range = (min(self.snr_range[0],valid.min()),
+                              max(self.snr_range[1],valid.max()))
+        if self.snr_prune == 'absolute':
+            cutoff = self.min_snr
+        elif self.snr_prune == 'running':
+            min_snr,max_snr = self.snr_range
+            cutoff = min_snr + self.snrthrs*(max_snr-min_snr)
+        else:
+            return pslist
+
+        return pslist[~(snr < cutoff)]
+
+    def _select(self,cand):
+        """
+        Select the retained candidates of peaks not lower than
+        peaks/threshold, and prune them as _prune does filter by filter.
+        The snr_range is that of the selected candidates.
+        """
+        # Compared in the precision of the normalized peaks
+        threshold = np.asarray(self.threshold,dtype=self.dtype)
+        cand = cand[cand['peak'] >= threshold]
+        snr = cand['snr']
+        valid = ~np.isnan(snr)
+        self.snr_range = (np.inf,-np.inf)
+        if valid.any():
+            self.snr_range = (snr[valid].min(),snr[valid].max())
+        if self.snr_prune == 'absolute':
+            return cand[~(snr < self.min_snr)]
+        elif self.snr_prune == 'running' and len(cand) > 0:
+            # Running range over the filters in order
+            ids = cand['filter_id']
+            min_snr = np.full(ids.max()+1,np.inf)
+            max_snr = np.full(ids.max()+1,-np.inf)
+            np.minimum.at(min_snr,ids[valid],snr[valid])
+            np.maximum.at(max_snr,ids[valid],snr[valid])
+            min_snr = np.minimum.accumulate(min_snr)[ids]
+            max_snr = np.maximum.accumulate(max_snr)[ids]
+            with np.errstate(invalid='ignore'):
+                cutoff = min_snr + self.snrthrs*(max_snr-min_snr)
+            return cand[~(snr < cutoff)]
+
+        return cand
+
+    def _retain(self):
+        """
+        Keep the candidates down to peaks/threshold, the peaks are located
+        again from the retained responses if any, otherwise the detection
+        is run again.
+        """
+        retained = self.retained
+        if retained is None or retained['detectors'] is None:
+            self.get_candidates(retain=True)
+            return
+        store = CandidateStore()
+        with self.profiler.stage("peaks"):
+            for filter_id,pd in enumerate(retained['detectors']):
+                pd.threshold = self.threshold
+                store.append(pd.get_pslist(),filter_id)
+        retained['threshold'] = self.threshold
+        retained['cand'] = store.to_array()
+
+    def retune(self,peak_threshold=None,snr_threshold=None,dist=None,
+               save=False):
+        """
+        Get the final point sources of the thresholds, which are kept for
+        the later calls. The candidates are detected once and kept in
+        memory, so only the peaks are selected, and the snr thresholding
+        and clustering are run again. The peaks are located again if the
+        peak threshold is lower than those retained, see the session
+        configs.
+
+        Parameters
+        ----------
+        peak_threshold: float
+            Threshold of the normalized peaks, the current one if None
+        snr_threshold: float
+            Threshold of the normalized snr, the current one if None
+        dist: float
+            Smallest distance of clustering, the current one if None
+        save: bool
+            Save the point sources as get_final does
+
+        Note
+        ----
+        The result is the same as get_final of the thresholds, except that
+        the coarse angles of filter/angle_coarse are selected with the
+        retained peaks.
+        """
+        if peak_threshold is not None:
+            self.threshold = peak_threshold
+        if snr_threshold is not None:
+            self.snrthrs = snr_threshold
+        if dist is not None:
+            self.cls_dist = dist
+        if self.retained is None or self.threshold < self.retained['threshold']:
+            self._retain()
+        cand = self._select(self.retained['cand'])
+
+        return self._get_final(cand,save)
 
     def get_potential(self):
         """Detect and get potential point sources """
-        # Init
-		# read image
-        imgmat = utils.img2mat(self.imgpath)
-        for s in self.scale_x:
-            for var_x in self.sigma_x:
-                for var_y in self.sigma_y:
-                    for ang in self.angle:
-                        egf = EGFilter(scale=(s,s),sigma=(var_x,var_y),angle=ang)
-                        pd = PeakDetector(self.Configs,imgmat,egf)
-                        if 'pot_list' not in locals().keys():
-                            pot_list = pd.get_pslist()
-                        else:
-                            pot_list = np.row_stack((pot_list,pd.get_pslist()))
-
-        return pot_list
+        return to_pslist(self.get_candidates())
 
     def get_final(self):
         """Discard false detections and clustering ps"""
-        # Init
-        pot_list = self.get_potential()
-        snr_list = pot_list[:,-1]
-        # Normalize snr and discard false
-        max_snr = snr_list.max()
-        min_snr = snr_list.min()
-        snr_list = (snr_list - min_snr)/(max_snr-min_snr)
-        # Discard
-        snr_idx = np.where(snr_list >= self.snrthrs)[0]
-        pslist_snr = pot_list[snr_idx,:]
+        return self._get_final(self.get_candidates(),self.save)
+
+    def _get_final(self,cand,save):
+        """Discard false detections of the candidates and clustering ps"""
+        profiler = self.profiler
+        with profiler.stage("snr"):
+            snr_list = cand['snr']
+            # Normalize snr by all candidates, including the pruned
+            min_snr,max_snr = self.snr_range
+            snr_list = (snr_list - min_snr)/(max_snr-min_snr)
+            # Discard
+            snr_idx = np.where(snr_list >= self.snrthrs)[0]
+            pslist_snr = to_pslist(cand[snr_idx])
+        profiler.count("candidates_kept",len(snr_idx))
 
         # Clustering
-        pslist = utils.cluster(pslist_snr,8,5)
+        with profiler.stage("cluster"):
+            pslist = utils.cluster_kdtree(pslist_snr,self.cls_dist,
+                                          self.cls_itertime,self.cls_method)
+        profiler.count("point_sources",len(pslist))
 
-        if self.save:
-            filepath = os.path.join(self.dirname,'pslist.reg')
-            utils.mat2reg(pslist,filepath)
+        if save:
+            with profiler.stage("save"):
+                filepath = os.path.join(self.dirname,'pslist.reg')
+                self.save_pslist(pslist,filepath)
 
         return pslist
 
+    def save_pslist(self,pslist,regpath):
+        """Save the region file, and the catalog if output/catalog is set"""
+        utils.mat2reg(pslist,regpath)
+        if self.catalog != 'none':
+            catpath = os.path.splitext(regpath)[0] + '.' + self.catalog
+            utils.mat2cat(pslist,catpath,self.catalog)
+
     def get_performance(self,pslist):
         """Compare detected pslist with the reference"""
         reflist = utils.reg2mat(self.refpath)
         # Compare
-        num_same,err_rate,cord_x,cord_y = utils.compare(pslist,reflist)
-        # Print result
-        print("==========Performance=======")
-        print("Error rate: %f" % err_rate)
-        print("Numer of same: %d" % num_same)
+        match = utils.match_catalog(pslist,reflist,self.cmp_radius,
+                                    self.cmp_method)
+        num_ref = len(reflist)
+        err_rate = np.nan
+        if num_ref > 0:
+            err_rate = (abs(len(pslist) - num_ref) + match['fn'])/num_ref
+        # Log result
+        logger.info("==========Performance=======")
+        logger.info("Error rate: %f" % err_rate)
+        logger.info("Numer of same: %d" % match['tp'])
+        logger.info("Precision: %f" % match['precision'])
+        logger.info("Recall: %f" % match['recall'])
+
+        return match
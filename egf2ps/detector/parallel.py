@@ -0,0 +1,87 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Parallel execution of the filter bank across processes.
+
+The image is placed in shared memory once, and each worker process attaches
+to it, builds its own convolver and integral image, and runs the groups of
+filters sent by a process pool. Results are merged in the order of the
+groups, so the output is the same as the serial execution.
+
+Methods
+-------
+get_pslists:
+    Generate the pslist of each filter with a process pool
+
+References
+----------
+[1] multiprocessing.shared_memory
+    https://docs.python.org/3/library/multiprocessing.shared_memory.html
+"""
+
+import os
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ..basiclass import IntegralImage
+
+# States of a worker process
+_worker = {}
+
+def _init_worker(detector,shm_name,shape,dtype):
+    """Attach the shared image and prepare the worker"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    imgmat = np.ndarray(shape,dtype=dtype,buffer=shm.buf)
+    _worker["shm"] = shm
+    _worker["imgmat"] = imgmat
+    _worker["detector"] = detector
+    _worker["convolver"] = detector.get_convolver(imgmat)
+    _worker["integral"] = IntegralImage(imgmat)
+
+def _run_group(group):
+    """Get the pslists of a group of filters"""
+    detector = _worker["detector"]
+    detector.steer_errors = []
+    detector.profiler.filters = []
+    pslists = list(detector._get_group_pslists(
+        _worker["imgmat"],_worker["convolver"],_worker["integral"],group))
+
+    return pslists,detector.steer_errors,detector.profiler.filters
+
+def get_pslists(detector,imgmat,groups,workers=0):
+    """
+    Generate the pslist of each filter in the groups with a process pool
+
+    Parameters
+    ----------
+    detector: Detector object
+        The detector, which is sent to the workers
+    imgmat: np.ndarray
+        The image
+    groups: iterable
+        Groups of filters, see FilterBank.get_groups
+    workers: int
+        Number of processes, 0 for all the CPUs
+    """
+    if workers <= 0:
+        workers = os.cpu_count()
+    imgmat = np.ascontiguousarray(imgmat)
+    shm = shared_memory.SharedMemory(create=True,size=max(imgmat.nbytes,1))
+    shared = np.ndarray(imgmat.shape,dtype=imgmat.dtype,buffer=shm.buf)
+    shared[...] = imgmat
+    try:
+        initargs = (detector,shm.name,imgmat.shape,imgmat.dtype)
+        with Pool(workers,initializer=_init_worker,initargs=initargs) as pool:
+            # imap keeps the order of the groups
+            for pslists,steer_errors,stats in pool.imap(_run_group,groups):
+                detector.steer_errors.extend(steer_errors)
+                detector.profiler.filters.extend(stats)
+                for pslist in pslists:
+                    yield pslist
+    finally:
+        del shared
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,191 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+A class namely ThresholdSweep is designed to evaluate the detection over a
+grid of the peak thresholds, snr thresholds and cluster distances against
+the reference catalog.
+
+The candidates are detected once down to the lowest peak threshold of the
+grid and retained by the Detector, then each grid point only selects the
+peaks, thresholds the snr and clusters, see Detector.retune. The point
+sources are matched with the reference by utils.match_catalog. Grid points
+are run by a pool of processes, each of which holds a copy of the retained
+candidates.
+
+Parameters
+----------
+Configs: Configs object
+    The configurations, the grid is of the sweep section, where an empty
+    list is the single value of peaks/threshold, snr/threshold or
+    cluster/dist
+workers: int
+    Number of processes, 0 for all the CPUs
+
+Methods
+-------
+get_grid:
+    Get the grid points
+run:
+    Evaluate all the grid points
+get_table:
+    Get the records as a table
+get_curves:
+    Get the precision-recall curve over the snr thresholds of each peak
+    threshold and distance
+get_best:
+    Get the record of the highest F1
+save:
+    Save the table as CSV and the curves as JSON
+"""
+
+import os
+import json
+from itertools import product
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from ..utils import utils
+from .detector import Detector
+
+# Columns of the table
+SWEEP_COLUMNS = ("peak_threshold","snr_threshold","dist","num_ps","tp","fp",
+                 "fn","precision","recall","f1","err_rate")
+
+# States of a worker process
+_worker = {}
+
+def _init_worker(detector,reflist):
+    """Keep the detector with the retained candidates, and the reference"""
+    _worker["detector"] = detector
+    _worker["reflist"] = reflist
+
+def _run_point(point):
+    """
+    Evaluate a grid point, whose precision, recall and F1 are 0 if no
+    point sources are left
+    """
+    detector = _worker["detector"]
+    reflist = _worker["reflist"]
+    peak_threshold,snr_threshold,dist = point
+    pslist = detector.retune(peak_threshold,snr_threshold,dist)
+    match = utils.match_catalog(pslist,reflist,detector.cmp_radius,
+                                detector.cmp_method)
+    precision,recall = match["precision"],match["recall"]
+    num_ref = len(reflist)
+    record = dict(peak_threshold=peak_threshold,snr_threshold=snr_threshold,
+                  dist=dist,num_ps=len(pslist),tp=match["tp"],
+                  fp=match["fp"],fn=match["fn"],precision=precision,
+                  recall=recall)
+    record["f1"] = (2*precision*recall/(precision+recall)
+                    if precision+recall > 0 else 0.0)
+    record["err_rate"] = ((abs(len(pslist)-num_ref) + match["fn"])/num_ref
+                          if num_ref > 0 else np.nan)
+
+    return record
+
+# Defination of class
+class ThresholdSweep:
+    def __init__(self,Configs,workers=1):
+        self.Configs = Configs
+        self.workers = workers
+        self._get_configs()
+        self.records = []
+
+    def _get_configs(self):
+        """Get the grid from the Configs"""
+        self.peak_thresholds = self.Configs.getn_value('sweep/peak_thresholds')
+        if len(self.peak_thresholds) == 0:
+            self.peak_thresholds = [self.Configs.getn_value('peaks/threshold')]
+        self.snr_thresholds = self.Configs.getn_value('sweep/snr_thresholds')
+        if len(self.snr_thresholds) == 0:
+            self.snr_thresholds = [self.Configs.getn_value('snr/threshold')]
+        self.dists = self.Configs.getn_value('sweep/dists')
+        if len(self.dists) == 0:
+            self.dists = [self.Configs.getn_value('cluster/dist')]
+        self.refpath = self.Configs.getn_value('input/refpath')
+
+    def get_grid(self):
+        """Get the (peak_threshold,snr_threshold,dist) of the grid points"""
+        return list(product(sorted(self.peak_thresholds),
+                            sorted(self.snr_thresholds),sorted(self.dists)))
+
+    def get_detector(self):
+        """
+        Get the detector whose candidates are retained down to the lowest
+        peak threshold of the grid
+        """
+        detector = Detector(self.Configs)
+        detector.save = False
+        detector.threshold = min(self.peak_thresholds)
+        detector.retain_threshold = None
+        # No peaks are located again
+        detector.retain_responses = False
+        detector.get_candidates(retain=True)
+
+        return detector
+
+    def run(self):
+        """
+        Evaluate all the grid points
+
+        Returns
+        -------
+        records: list
+            Records of the grid points in the order of get_grid, whose keys
+            are SWEEP_COLUMNS
+        """
+        reflist = utils.reg2mat(self.refpath)
+        detector = self.get_detector()
+        grid = self.get_grid()
+        workers = self.workers or os.cpu_count()
+        if workers > 1 and len(grid) > 1:
+            # The candidates are sent once to each worker
+            with Pool(min(workers,len(grid)),initializer=_init_worker,
+                      initargs=(detector,reflist)) as pool:
+                self.records = pool.map(_run_point,grid)
+        else:
+            _init_worker(detector,reflist)
+            self.records = [_run_point(point) for point in grid]
+            _worker.clear()
+
+        return self.records
+
+    def get_table(self):
+        """Get the records as a pandas.DataFrame"""
+        return pd.DataFrame(self.records,columns=SWEEP_COLUMNS)
+
+    def get_curves(self):
+        """
+        Get the curves of each (peak_threshold,dist) over the snr thresholds
+
+        Returns
+        -------
+        curves: list
+            Dicts of the peak_threshold, dist, and the lists of snr_threshold,
+            precision, recall and f1 in the ascending snr thresholds
+        """
+        table = self.get_table()
+        curves = []
+        for (peak_threshold,dist),rows in table.groupby(
+                ["peak_threshold","dist"],sort=True):
+            rows = rows.sort_values("snr_threshold")
+            curve = dict(peak_threshold=float(peak_threshold),dist=float(dist))
+            for key in ("snr_threshold","precision","recall","f1"):
+                curve[key] = rows[key].astype(float).tolist()
+            curves.append(curve)
+
+        return curves
+
+    def get_best(self):
+        """Get the record of the highest F1, the first one of ties"""
+        return max(self.records,key=lambda record: record["f1"])
+
+    def save(self,basepath):
+        """Save the table to <basepath>.csv and curves to <basepath>.json"""
+        self.get_table().to_csv(basepath + '.csv',index=False)
+        with open(basepath + '.json','w') as fp:
+            json.dump(dict(best=self.get_best(),curves=self.get_curves()),
+                      fp,indent=1)
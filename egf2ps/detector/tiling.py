@@ -0,0 +1,409 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Tiled detection of images larger than memory.
+
+The image is split into tiles, and each tile is read with a halo around it.
+The halo covers the largest kernel, so the smoothed pixels of the tile are
+the same as those of the whole image, and also covers the peak suppression
+window and the snr neighbor region of the sources in the tile.
+
+Three passes are made over the tiles. The first gets the extrema of the
+smoothed image of each filter, which normalize the peaks as the whole
+image does. The second and the third are run for one group of filters at
+a time, i.e., one (scale,sigma_x,sigma_y), so only the candidates of the
+group are held. In the second, each tile suppresses its candidates in the
+order of the whole image, where the candidates of the halo are of unknown
+fates, and so are the candidates which may be suppressed by an unknown
+one. The peaks surely kept are returned with their snr, and the unknown
+candidates, which lie in strips along the tile borders, only as their flat
+indices and peaks. The unknown candidates of all tiles are suppressed
+together with the peaks kept in the border strips, since a suppression
+can be chained across the tile borders further than any halo. The third
+computes the snr of the peaks kept of the unknown candidates, by the tiles
+owning them. The peaks are thus those of the whole image, up to the
+rounding of the convolutions, which may break the ties of the peaks in
+other orders.
+
+Memory is bounded by the tiles, the border strips of one group and the
+peaks instead of the image, at the cost of convolving the tiles twice and
+reading them up to twice per group. The tiles are read one by one from the
+file, by the processes of a pool if configured. In the steerable mode, the
+basis of each group is built once for all the tiles.
+
+Methods
+-------
+get_tiles:
+    Generate the bounds of the tiles and their halos
+get_pslists:
+    Generate the pslist of each filter by tiles
+"""
+
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from ..basiclass import IntegralImage
+from ..basiclass import compute_snr
+from ..basiclass import suppress_peaks
+
+# States of a worker process
+_worker = {}
+
+def get_tiles(shape,tile_size,halo):
+    """
+    Generate the bounds of the tiles
+
+    Parameters
+    ----------
+    shape: tuple
+        Shape of the image
+    tile_size: int
+        Size of the tiles
+    halo: int
+        Width of the halo around a tile
+
+    Returns
+    -------
+    region: tuple
+        (y0,y1,x0,x1) of the tile with the halo, clipped by the image
+    owned: tuple
+        (y0,y1,x0,x1) of the tile
+    """
+    rows,cols = shape
+    for y0 in range(0,rows,tile_size):
+        for x0 in range(0,cols,tile_size):
+            y1 = min(y0+tile_size,rows)
+            x1 = min(x0+tile_size,cols)
+            region = (max(y0-halo,0),min(y1+halo,rows),
+                      max(x0-halo,0),min(x1+halo,cols))
+            yield region,(y0,y1,x0,x1)
+
+def _get_detectors(detector,tilemat,groups,stfs):
+    """Generate the smoothed PeakDetectors of a tile with their groups"""
+    tilemat = np.asarray(tilemat,dtype=detector.dtype)
+    convolver = detector.get_convolver(tilemat)
+    integral = IntegralImage(tilemat)
+    for k,(group,stf) in enumerate(zip(groups,stfs)):
+        for pd in detector._get_detectors(tilemat,convolver,integral,group,
+                                          stf):
+            pd.smooth()
+            yield k,pd
+
+def _get_extrema(detector,tilemat,region,owned,groups,stfs):
+    """Get the (min,max) of the smoothed owned pixels of each filter"""
+    oy0,oy1,ox0,ox1 = np.subtract(owned,np.repeat(region[0::2],2))
+    extrema = [[] for group in groups]
+    for k,pd in _get_detectors(detector,tilemat,groups,stfs):
+        imgowned = pd.imgsmooth[oy0:oy1,ox0:ox1]
+        extrema[k].append((imgowned.min(),imgowned.max()))
+
+    return extrema
+
+def _resolve_peaks(imgnorm,cand,owned,neighbors):
+    """
+    Suppress the candidates of a tile as PeakDetector._suppress, where the
+    fates of the candidates out of the owned box are unknown. A candidate
+    is suppressed by a higher peak surely kept, and is unknown if it may be
+    suppressed by a higher unknown one, so the unknown fates only spread
+    from the halo, mostly within the border strips.
+
+    Parameters
+    ----------
+    imgnorm: np.ndarray
+        The normalized smoothed tile with the halo
+    cand: np.ndarray
+        Flat indices of the candidates in row-major order
+    owned: tuple
+        (y0,y1,x0,x1) of the owned box in the tile
+    neighbors: int
+        Half size of the suppression window
+
+    Returns
+    -------
+    kept: np.ndarray
+        Flat indices of the owned peaks surely kept, in the order taken
+    unknown: np.ndarray
+        Flat indices of the owned candidates of unknown fates
+    """
+    rows,cols = imgnorm.shape
+    oy0,oy1,ox0,ox1 = owned
+    n = neighbors
+    values = imgnorm.ravel()[cand]
+    order = np.argsort(-values,kind='stable')
+    cand = cand[order]
+    values = values[order]
+    suppressed = np.zeros((rows,cols),dtype=bool)
+    unsure = np.zeros((rows,cols),dtype=bool)
+    kept = []
+    unknown = []
+    pending = []
+    for i in range(len(cand)):
+        peak_y,peak_x = divmod(int(cand[i]),cols)
+        if not suppressed[peak_y,peak_x]:
+            inside = oy0 <= peak_y < oy1 and ox0 <= peak_x < ox1
+            if inside and not unsure[peak_y,peak_x]:
+                kept.append(cand[i])
+                pending.append((peak_x,peak_y,suppressed))
+            else:
+                if inside:
+                    unknown.append(cand[i])
+                pending.append((peak_x,peak_y,unsure))
+        # Suppress after the last candidate of the same value
+        if i == len(cand)-1 or values[i+1] != values[i]:
+            for peak_x,peak_y,mask in pending:
+                mask[max(peak_y-1-n,0):min(peak_y+n,rows),
+                     max(peak_x-n,0):min(peak_x+n,cols)] = True
+            pending = []
+
+    return np.array(kept,dtype=int),np.array(unknown,dtype=int)
+
+def _get_tile_candidates(detector,tilemat,region,owned,group,stf,extrema,
+                         shape):
+    """
+    Get the peaks of each filter of a group owned by a tile, which are
+    surely kept by the suppression within the tile, with their snr, and
+    the compact candidates of unknown fates
+
+    Returns
+    -------
+    results: list
+        (pslist,border,unknown,values,shape_ps,neighbors) of each filter,
+        i.e., the peaks surely kept, whether they are in the border strips,
+        the flat indices in the image and the peaks of the unknown
+        candidates, and the (axis_x,axis_y,angle) of the filter
+    stats: list
+        The stats of each filter
+    """
+    ry0,ry1,rx0,rx1 = region
+    oy0,oy1,ox0,ox1 = owned
+    # Smoothed pixels within the kernel from the tile edges are invalid,
+    # unless the edges are those of the image.
+    khalf = detector.get_kernel_half()
+    vy0 = khalf if ry0 > 0 else 0
+    vx0 = khalf if rx0 > 0 else 0
+    vy1 = (ry1-ry0) - (khalf if ry1 < shape[0] else 0)
+    vx1 = (rx1-rx0) - (khalf if rx1 < shape[1] else 0)
+    box = (oy0-ry0,oy1-ry0,ox0-rx0,ox1-rx0)
+    results = []
+    stats = []
+    detectors = _get_detectors(detector,tilemat,[group],[stf])
+    for (_,pd),norm_range in zip(detectors,extrema):
+        # The invalid pixels are set to the min, neither peaks nor suppress
+        pd.imgsmooth[:vy0] = norm_range[0]
+        pd.imgsmooth[vy1:] = norm_range[0]
+        pd.imgsmooth[:,:vx0] = norm_range[0]
+        pd.imgsmooth[:,vx1:] = norm_range[0]
+        pd.norm_range = norm_range
+        pd.normalize()
+        start = time.perf_counter()
+        cand = pd._find_candidates()
+        n = pd.neighbors
+        kept,unknown = _resolve_peaks(pd.imgnorm,cand,box,n)
+        imgnorm = pd.imgnorm.ravel()
+        cols = pd.imgnorm.shape[1]
+        cord_y,cord_x = np.divmod(kept,cols)
+        pd.peaklist = [imgnorm[kept],cord_x,cord_y]
+        pd.timings["peaks"] += time.perf_counter() - start
+        pslist = pd._to_pslist(pd.peaklist)
+        start = time.perf_counter()
+        pslist[:,6] = compute_snr(pd.imgmat,pslist[:,0:2],pslist[:,2:4],
+                                  pslist[:,4],pd.integral)
+        pd.timings["snr"] += time.perf_counter() - start
+        pslist[:,0] += rx0
+        pslist[:,1] += ry0
+        # The peaks which may suppress the candidates of other tiles
+        reach = n + 2
+        border = ((pslist[:,0] < ox0+reach) | (pslist[:,0] >= ox1-reach) |
+                  (pslist[:,1] < oy0+reach) | (pslist[:,1] >= oy1-reach))
+        unknown_y,unknown_x = np.divmod(unknown,cols)
+        flat = (unknown_y+ry0)*shape[1] + unknown_x+rx0
+        shape_ps = pd._to_pslist([[0.0],[0],[0]])[0,2:5]
+        results.append((pslist,border,flat,imgnorm[unknown],shape_ps,n))
+        stats.append(pd.get_stats())
+        # Free the smoothed tile before smoothing the next filter
+        del pd,imgnorm
+
+    return results,stats
+
+def _get_tile_snr(detector,tilemat,region,pslists):
+    """Get the snr of the peaks owned by a tile, and the time of each"""
+    ry0,ry1,rx0,rx1 = region
+    tilemat = np.asarray(tilemat,dtype=detector.dtype)
+    integral = IntegralImage(tilemat)
+    snrs = []
+    timings = []
+    for pslist in pslists:
+        start = time.perf_counter()
+        snrs.append(compute_snr(tilemat,pslist[:,0:2]-(rx0,ry0),
+                                pslist[:,2:4],pslist[:,4],integral))
+        timings.append(time.perf_counter() - start)
+
+    return snrs,timings
+
+def _merge_peaks(cands,shape):
+    """
+    Resolve the candidates of unknown fates of a filter over all tiles
+
+    The unknown candidates are suppressed together with the peaks surely
+    kept in the border strips, which are all the peaks of other tiles that
+    may suppress them, so their fates are those of the whole image.
+
+    Returns
+    -------
+    pslist: np.ndarray
+        The peaks surely kept by the tiles
+    resolved: np.ndarray
+        The peaks kept of the unknown candidates, whose snr are NaN
+    elapsed: float
+        Time of the suppression in seconds
+    """
+    start = time.perf_counter()
+    pslist = np.vstack([cand[0] for cand in cands])
+    border = np.concatenate([cand[1] for cand in cands])
+    flat = np.concatenate([cand[2] for cand in cands])
+    values = np.concatenate([cand[3] for cand in cands])
+    shape_ps,neighbors = cands[0][4],cands[0][5]
+    cord_y,cord_x = np.divmod(flat,shape[1])
+    num_border = np.count_nonzero(border)
+    keep = suppress_peaks(np.concatenate((pslist[border,5],values)),
+                          np.concatenate((pslist[border,0],cord_x)),
+                          np.concatenate((pslist[border,1],cord_y)),
+                          neighbors)
+    # The border peaks are surely kept, only the unknown ones are added
+    keep = np.sort(keep[keep >= num_border]) - num_border
+    resolved = np.zeros((len(keep),7))
+    resolved[:,0] = cord_x[keep]
+    resolved[:,1] = cord_y[keep]
+    resolved[:,2:5] = shape_ps
+    resolved[:,5] = values[keep]
+    resolved[:,6] = np.nan
+
+    return pslist,resolved,time.perf_counter() - start
+
+def _init_worker(detector,shape,groups,stfs):
+    """Prepare the worker"""
+    _worker["detector"] = detector
+    _worker["shape"] = shape
+    _worker["groups"] = groups
+    _worker["stfs"] = stfs
+
+def _read_tile(region):
+    """Read the cutout of a tile"""
+    y0,y1,x0,x1 = region
+    return _worker["detector"].read_image((slice(y0,y1),slice(x0,x1)))
+
+def _run_extrema(tile):
+    region,owned = tile
+    return _get_extrema(_worker["detector"],_read_tile(region),region,owned,
+                        _worker["groups"],_worker["stfs"])
+
+def _run_candidates(args):
+    (region,owned),k,extrema = args
+    return _get_tile_candidates(_worker["detector"],_read_tile(region),region,
+                                owned,_worker["groups"][k],_worker["stfs"][k],
+                                extrema,_worker["shape"])
+
+def _run_snr(args):
+    (region,owned),pslists = args
+    return _get_tile_snr(_worker["detector"],_read_tile(region),region,
+                         pslists)
+
+def _get_group_pslists(mapper,tiles,k,extrema,shape):
+    """
+    Get the pslists of the filters of a group by the second and the third
+    passes over the tiles, and the stats of the filters
+    """
+    # Second pass: the peaks resolved by each tile
+    tile_cands = list(mapper(_run_candidates,
+                             [(tile,k,extrema) for tile in tiles]))
+    tile_cands,tile_stats = zip(*tile_cands)
+    pslists = []
+    resolved = []
+    stats = []
+    for cands,filter_stats in zip(zip(*tile_cands),zip(*tile_stats)):
+        pslist,resolved_ps,elapsed = _merge_peaks(cands,shape)
+        pslists.append(pslist)
+        resolved.append(resolved_ps)
+        # Stats of a filter are summed over the tiles
+        merged = dict(filter_stats[0])
+        for key in ("smooth","peaks","snr"):
+            merged[key] = sum(st[key] for st in filter_stats)
+        merged["peaks"] += elapsed
+        merged["num_peaks"] = len(pslist) + len(resolved_ps)
+        stats.append(merged)
+    del tile_cands
+    # Third pass: the snr of the resolved peaks, only by their tiles
+    tasks = []
+    owners = []
+    for tile in tiles:
+        oy0,oy1,ox0,ox1 = tile[1]
+        owned = [(ps[:,0] >= ox0) & (ps[:,0] < ox1) &
+                 (ps[:,1] >= oy0) & (ps[:,1] < oy1) for ps in resolved]
+        if any(own.any() for own in owned):
+            tasks.append((tile,[ps[own] for ps,own in zip(resolved,owned)]))
+            owners.append(owned)
+    for owned,(snrs,timings) in zip(owners,mapper(_run_snr,tasks)):
+        for ps,own,snr,st,elapsed in zip(resolved,owned,snrs,stats,timings):
+            ps[own,6] = snr
+            st["snr"] += elapsed
+    for i,(pslist,resolved_ps) in enumerate(zip(pslists,resolved)):
+        pslist = np.vstack((pslist,resolved_ps))
+        # The order taken by the suppression of the whole image
+        order = np.lexsort((pslist[:,0],pslist[:,1],-pslist[:,5]))
+        pslists[i] = pslist[order]
+
+    return pslists,stats
+
+def get_pslists(detector,shape,groups,tile_size,workers=1):
+    """
+    Generate the pslist of each filter by tiles
+
+    Parameters
+    ----------
+    detector: Detector object
+        The detector, whose read_image reads the tiles
+    shape: tuple
+        Shape of the image
+    groups: iterable
+        Groups of filters, see FilterBank.get_groups
+    tile_size: int
+        Size of the tiles
+    workers: int
+        Number of processes to run the tiles, 0 for all the CPUs
+    """
+    groups = list(groups)
+    # The steerable filters are built once for all the tiles
+    stfs = [None] * len(groups)
+    if detector.steerable:
+        stfs = [detector.get_steerable(group) for group in groups]
+    tiles = list(get_tiles(shape,tile_size,detector.get_halo()))
+    pool = None
+    if workers != 1:
+        pool = Pool(workers or None,initializer=_init_worker,
+                    initargs=(detector,shape,groups,stfs))
+        mapper = pool.imap
+    else:
+        _init_worker(detector,shape,groups,stfs)
+        mapper = map
+    try:
+        # First pass: extrema of the whole image
+        tile_extrema = list(mapper(_run_extrema,tiles))
+        extrema = []
+        for k in range(len(groups)):
+            group_extrema = np.array([te[k] for te in tile_extrema])
+            extrema.append(list(zip(group_extrema[:,:,0].min(axis=0),
+                                    group_extrema[:,:,1].max(axis=0))))
+        for k in range(len(groups)):
+            pslists,stats = _get_group_pslists(mapper,tiles,k,extrema[k],
+                                               shape)
+            detector.profiler.filters.extend(stats)
+            for pslist in pslists:
+                yield pslist
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        _worker.clear()
@@ -0,0 +1,106 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+A class namely Profiler is designed to time the stages of a detection, and
+count the filters, peaks and candidates, which are reported as JSON.
+
+Stages are timed by the stage context manager. If tracemalloc is tracing,
+the peak memory allocated within each stage is also recorded, so stages
+should not be nested. Statistics of each filter, e.g., the timings of the
+PeakDetector, are appended to filters.
+
+Methods
+-------
+stage:
+    Context manager timing a stage
+count:
+    Add to a counter
+get_report:
+    Get the report as a dict
+save:
+    Save the report to a JSON file
+log:
+    Log a summary of the report
+
+References
+----------
+[1] tracemalloc
+    https://docs.python.org/3/library/tracemalloc.html
+"""
+
+import json
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Timings of the filters, see PeakDetector.timings
+FILTER_TIMINGS = ("smooth","peaks","snr")
+
+# Defination of class
+class Profiler:
+    def __init__(self):
+        self.info = OrderedDict()
+        self.stages = OrderedDict()
+        self.counters = OrderedDict()
+        self.filters = []
+
+    @contextmanager
+    def stage(self,name):
+        """Time the stage, and trace its peak memory if tracemalloc is on"""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base,_ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = self.stages.setdefault(name,OrderedDict(time=0.0,calls=0))
+            record["time"] += time.perf_counter() - start
+            record["calls"] += 1
+            if tracing:
+                _,peak = tracemalloc.get_traced_memory()
+                record["peak_bytes"] = max(record.get("peak_bytes",0),
+                                           peak - base)
+
+    def count(self,name,value=1):
+        """Add value to the counter"""
+        self.counters[name] = self.counters.get(name,0) + int(value)
+
+    def get_report(self):
+        """
+        Get the report, with the sum of the timings of all filters, which
+        is the cpu time of the processes when run in parallel.
+        """
+        totals = OrderedDict((key,sum(f[key] for f in self.filters))
+                             for key in FILTER_TIMINGS)
+        report = OrderedDict()
+        report["info"] = self.info
+        report["stages"] = self.stages
+        report["counters"] = self.counters
+        report["filter_totals"] = totals
+        report["filters"] = self.filters
+        if tracemalloc.is_tracing():
+            report["tracemalloc_peak"] = tracemalloc.get_traced_memory()[1]
+
+        return report
+
+    def save(self,filepath):
+        """Save the report to the JSON file"""
+        with open(filepath,'w') as fp:
+            json.dump(self.get_report(),fp,indent=1)
+
+    def log(self,logger):
+        """Log the time of each stage and the counters"""
+        for name,record in self.stages.items():
+            msg = "Stage %s: %.3f s" % (name,record["time"])
+            if "peak_bytes" in record:
+                msg += ", peak %.1f MB" % (record["peak_bytes"] / 1024**2)
+            logger.info(msg)
+        report = self.get_report()
+        logger.info("Filters: " + ", ".join("%s %.3f s" % item for item in
+                                            report["filter_totals"].items()))
+        logger.info("Counters: " + ", ".join("%s %d" % item for item in
+                                             self.counters.items()))
@@ -10,47 +10,169 @@ reg2mat:
     Read point sources list from the region file, and translate it into np.ndarray
 mat2reg:
     Print PS list matrix to ds9 region files
+mat2cat:
+    Save PS list matrix as a FITS table, CSV or Parquet catalog
 compare:
     Compare detected PS with the references
+match_catalog:
+    One-to-one matching of detected PS and the references with a KD-tree
 img2mat:
     Read image from the provided path
+open_image:
+    Context manager of a FITS image HDU
+get_evt_grid:
+    Get the binning grid of a FITS event list
+evt2mat:
+    Bin the events of a FITS event list as the image, chunk by chunk
+pyrdown:
+    Downsample the image by 2 as a level of the Gaussian pyramid
+gen_field:
+    Generate a synthetic Poisson field of elliptical point sources
+cluster:
+    Cluster the potential point sources
+cluster_kdtree:
+    Cluster the potential point sources with a KD-tree
 logManager:
     Configure logging style <to be strengthed>
 
 References
 ------------
-[1] scipy.ndimage
-	  http://docs.scipy.org/doc/scipy/reference/generated/scipy.ndimage.
-	  imread.html#scipy.ndimage.imread
+[1] matplotlib.image
+	  https://matplotlib.org/stable/api/image_api.html#matplotlib.image.imread
 """
 
 import os
+import re
 import sys
 import logging
+import warnings
+from contextlib import contextmanager
 import numpy as np
+import pandas as pd
 import pyregion
 from astropy.io import fits
-from scipy.ndimage import imread
+from scipy.ndimage import gaussian_filter
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from scipy.optimize import linear_sum_assignment
+
+# Shapes of the region files parsed by reg2mat, and the lines skipped, i.e.,
+# the coordinate systems and global properties
+_REG_SHAPE = re.compile(r"(?:^|;)[ \t]*[+-]?[ \t]*(ellipse|circle|box)[ \t]*"
+                        r"\(([^()]*)\)",re.IGNORECASE|re.MULTILINE)
+_REG_OTHER = re.compile(r"^(global\b|image$|physical$|logical$|"
+                        r"fk4$|fk5$|icrs$|galactic$|ecliptic$|linear$|wcs\w*$|"
+                        r"amplifier$|detector$)",re.IGNORECASE)
+_REG_COMMENT = re.compile(r"#[^\n]*")
+# Size in characters of the chunks of lines parsed at once
+_REG_CHUNK = 1 << 22
+
+# Columns of the catalogs saved by mat2cat
+CATALOG_COLUMNS = ("core_x","core_y","axis_x","axis_y","angle","peak","snr")
 
 # Defination of functions
-def reg2mat(filename):
+def reg2mat(filename,cache=True):
     """
-    Read region files and transform to matrix,the pyregion module is used.
+    Read region files and transform to matrix, each row holds the
+    parameters of an ellipse, circle or box shape, i.e., its coord_list
+    of pyregion. Rows of fewer parameters than the others are padded
+    with NaN.
+
+    The shapes are parsed by regular expressions line by line, and files
+    of other shapes or non-numeric coordinates, e.g., sexagesimal ones,
+    are read by pyregion. The matrix is cached as <filename>.npy whose
+    mtime is set to that of the region file, so it is reloaded until the
+    region file is modified.
+
+    Parameters
+    ----------
+    filename: str
+        Path of the region file
+    cache: bool
+        Load and save the cached matrix
     """
-    # Init
-    if os.path.exists(filename):
-        pslist = pyregion.open(filename)
-    else:
-        return 0
-    # Split and get the numbers
-    num_ps = len(pslist)
-    ps = []
-    for i in range(num_ps):
-        ps.append(pslist[i].coord_list)
-
-    ps = np.array(ps)
+    if not os.path.exists(filename):
+        raise IOError("Region file %s does not exist." % filename)
+    mtime = os.stat(filename).st_mtime_ns
+    cachepath = filename + '.npy'
+    if cache and os.path.exists(cachepath):
+        if os.stat(cachepath).st_mtime_ns == mtime:
+            try:
+                return np.load(cachepath)
+            except (IOError,ValueError):
+                pass
+
+    ps = _parse_reg(filename)
+    if ps is None:
+        # Fallback to pyregion
+        ps = np.array([shape.coord_list for shape in pyregion.open(filename)])
+    if cache:
+        _save_reg_cache(cachepath,ps,mtime)
+
+    return ps
+
+def _parse_reg(filename):
+    """Parse the shapes of the region file, None if any is unsupported"""
+    params = []
+    with open(filename,'r') as reg:
+        # Streamed by chunks of lines
+        for lines in iter(lambda: reg.readlines(_REG_CHUNK),[]):
+            # Comments and properties follow '#'
+            text = _REG_COMMENT.sub('',''.join(lines))
+            params.extend(p for _,p in _REG_SHAPE.findall(text))
+            # Anything else should be a coordinate system or global line
+            others = set(item.strip() for item in
+                         re.split(r"[;\n]",_REG_SHAPE.sub(';',text)))
+            others.discard('')
+            if any(_REG_OTHER.match(item) is None for item in others):
+                return None
+
+    if len(params) == 0:
+        return np.zeros((0,5))
+    # The parameters of all shapes are converted at once
+    lengths = np.array([p.count(',') + 1 for p in params])
+    with warnings.catch_warnings():
+        # Unmatched data warns or raises by the version of numpy
+        warnings.simplefilter('error',DeprecationWarning)
+        try:
+            values = np.fromstring(','.join(params),sep=',')
+        except (ValueError,DeprecationWarning):
+            values = None
+    if values is None or len(values) != lengths.sum():
+        # Non-numeric coordinates
+        return None
+    rows = np.repeat(np.arange(len(params)),lengths)
+    cols = np.arange(len(values)) - np.repeat(np.cumsum(lengths)-lengths,lengths)
+    ps = np.full((len(params),lengths.max()),np.nan)
+    ps[rows,cols] = values
+
     return ps
 
+def _save_reg_cache(cachepath,ps,mtime):
+    """Save the parsed matrix atomically with the mtime of the region"""
+    tmppath = cachepath + '.tmp'
+    try:
+        with open(tmppath,'wb') as fp:
+            np.save(fp,ps)
+        os.utime(tmppath,ns=(mtime,mtime))
+        os.replace(tmppath,cachepath)
+    except OSError:
+        # E.g., the directory is read only
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+def _get_rows(ps):
+    """
+    Get the ps list as a two dimensional matrix, an empty one is of the
+    six columns of the final point sources unless its columns are given.
+    """
+    ps = np.asarray(ps,dtype=float)
+    if len(ps) == 0:
+        num_cols = ps.shape[1] if ps.ndim == 2 else 6
+        return np.zeros((0,num_cols))
+    return ps.reshape(len(ps),-1)
+
 def mat2reg(ps,outfile,pstype = 'elp'):
     """
     Transform ps mat to region file
@@ -64,23 +186,52 @@ def mat2reg(ps,outfile,pstype = 'elp'):
     pstype: str
         Type of region, can be 'elp','cir','box'
     """
+    rows = _get_rows(ps).tolist()
+    # All the lines are formatted at once
+    if pstype == 'elp':
+        lines = ['ellipse(%r,%r,%r,%r,%r)\n' % tuple(r[0:5]) for r in rows]
+    elif pstype == 'cir':
+        lines = ['circle(%r,%r,%r)\n' % tuple(r[0:3]) for r in rows]
+    else:
+        lines = ['box(%r,%r,%r,%r,0)\n' % tuple(r[0:4]) for r in rows]
+    with open(outfile,'w') as reg:
+        reg.write(''.join(lines))
+
+def mat2cat(ps,outfile,fmt=None):
+    """
+    Save the ps mat as a catalog table, whose columns are those of the
+    pslist, i.e., core_x,core_y,axis_x,axis_y,angle,peak and snr if any.
 
-    reg = open(outfile,'w+')
-    if pstype is 'elp':
-        for i in range(ps.shape[0]):
-            ps_str = 'ellipse(' + str(ps[i,0])+','+ str(ps[i,1])+\
-                ','+str(ps[i,2])+','+str(ps[i,3])+','+str(ps[i,4])+')\n'
-            reg.write(ps_str)
-    elif pstype is 'cir':
-        for i in range(ps.shape[0]):
-            ps_str = 'circle(' + str(ps[i,0])+','+ str(ps[i,1])+','+str(ps[i,2])+')\n'
-            reg.write(ps_str)
+    Parameters
+    ----------
+    ps: np.ndarray
+        A two dimensional matrix holds the information of point sources
+    outfile: str
+        Name of the output file
+    fmt: str
+        'fits' (binary table), 'csv' or 'parquet', guessed from the
+        extension of outfile if None. Parquet requires pyarrow or
+        fastparquet for pandas.
+    """
+    if fmt is None:
+        fmt = os.path.splitext(outfile)[-1].lstrip('.').lower()
+    ps = _get_rows(ps)
+    names = CATALOG_COLUMNS[:ps.shape[1]]
+    if fmt in ('fits','fit'):
+        cols = [fits.Column(name=name,format='D',array=ps[:,i])
+                for i,name in enumerate(names)]
+        hdu = fits.BinTableHDU.from_columns(cols,name='PSLIST')
+        hdu.writeto(outfile,overwrite=True)
+        return
+    table = pd.DataFrame(ps,columns=names)
+    if fmt == 'csv':
+        table.to_csv(outfile,index=False)
+    elif fmt == 'parquet':
+        table.to_parquet(outfile,index=False)
     else:
-        for i in range(ps.shape[0]):
-            ps_str = 'box(' + str(ps[i,0])+','+ str(ps[i,1])+','+str(ps[i,2])+','+str(ps[i,3])+',0)\n'
-            reg.write(ps_str)
+        raise ValueError("Unknown catalog format: %s" % fmt)
 
-def compare(ps,ps_ref):
+def compare(ps,ps_ref,radius=5.0,method='greedy'):
     """
     Compare detected ps with the real one or reference
 
@@ -90,6 +241,10 @@ def compare(ps,ps_ref):
         Detected point source list
     ps_ref: np.ndarray
         Referenced point source list
+    radius: float
+        Largest distance between the same PS
+    method: str
+        Matching method, 'greedy' or 'optimal', see match_catalog
 
     Returns
     -------
@@ -100,41 +255,149 @@ def compare(ps,ps_ref):
     err_rate: float
         Error rate
     """
+    match = match_catalog(ps,ps_ref,radius,method)
+    num_same = match['tp']
+    cores = _get_cores(ps)
+    cord_x = cores[match['idx'],0].tolist()
+    cord_y = cores[match['idx'],1].tolist()
 
-    # Init
-    num_same = 0
-    err_rate = 0.0
-    cord_x = []
-    cord_y = []
-
-    # Extract coordinates of ps and ps_ref
-    ps_x = ps[:,0].tolist()
-    ps_y = ps[:,1].tolist()
-    ps_ref_x = ps_ref[:,0].tolist()
-    ps_ref_y = ps_ref[:,1].tolist()
-
-    # Compare
-    i = 1
-    while  i <= len(ps_ref_x) - 1:
-        j = 1
-        while j <= len(ps_ref_x) - 1:
-            d = np.sqrt((ps_x[j]-ps_ref_x[i])**2 + (ps_y[j]-ps_ref_y[i])**2)
-            if d <= 5:
-                num_same += 1
-                cord_x.append(ps_x[j])
-                cord_y.append(ps_y[j])
-                ps_x.remove(ps_x[j])
-                ps_y.remove(ps_y[j])
-                break
-            j += 1
-        i += 1
-
-    len_ps = ps.shape[0]
-    err_rate = (abs(len_ps - len(ps_ref_x)) + len(ps_ref_x) - num_same)/ len(ps_ref_x)
+    len_ps = len(cores)
+    len_ref = len(_get_cores(ps_ref))
+    err_rate = np.nan
+    if len_ref > 0:
+        err_rate = (abs(len_ps - len_ref) + len_ref - num_same)/ len_ref
 
     return num_same,err_rate,cord_x,cord_y
 
-def img2mat(imgpath):
+def match_catalog(ps,ps_ref,radius=5.0,method='greedy'):
+    """
+    One-to-one matching of the detected ps and the references, the pairs
+    within radius are found by KD-trees.
+
+    Parameters
+    ----------
+    ps: np.ndarray
+        Detected point source list, the first two columns are the cores
+    ps_ref: np.ndarray
+        Referenced point source list, the first two columns are the cores
+    radius: float
+        Largest distance between the matched PS
+    method: str
+        'greedy': pairs are matched from the nearest;
+        'optimal': the most pairs are matched with the least total distance
+
+    Returns
+    -------
+    match: dict
+        idx,idx_ref: indices of the matched ps and references
+        dist: distances of the matched pairs
+        tp,fp,fn: numbers of true positive, false positive and false negative
+        precision,recall: tp/(tp+fp) and tp/(tp+fn)
+    """
+    cores = _get_cores(ps)
+    cores_ref = _get_cores(ps_ref)
+    if len(cores) == 0 or len(cores_ref) == 0:
+        # Nothing to match
+        idx = np.zeros(0,dtype=int)
+        idx_ref = np.zeros(0,dtype=int)
+    else:
+        # Pairs within radius
+        pairs = cKDTree(cores).sparse_distance_matrix(
+            cKDTree(cores_ref),radius,output_type='ndarray')
+        if method == 'optimal':
+            idx,idx_ref = _match_optimal(pairs,len(cores),radius)
+        else:
+            idx,idx_ref = _match_greedy(pairs,len(cores),len(cores_ref))
+    dist = np.sqrt(np.sum((cores[idx]-cores_ref[idx_ref])**2,axis=1))
+
+    tp = len(idx)
+    fp = len(cores) - tp
+    fn = len(cores_ref) - tp
+    match = {"idx": idx,
+             "idx_ref": idx_ref,
+             "dist": dist,
+             "tp": tp,
+             "fp": fp,
+             "fn": fn,
+             "precision": tp/(tp+fp) if tp+fp > 0 else 0.0,
+             "recall": tp/(tp+fn) if tp+fn > 0 else 0.0}
+
+    return match
+
+def _get_cores(ps):
+    """Get the (num,2) cores of the ps list, which may be empty"""
+    ps = np.asarray(ps,dtype=float)
+    if ps.size == 0:
+        return np.zeros((0,2))
+    return ps.reshape(len(ps),-1)[:,0:2]
+
+def _match_greedy(pairs,num_ps,num_ref):
+    """Match the pairs from the nearest"""
+    order = np.lexsort((pairs['j'],pairs['i'],pairs['v']))
+    used = np.zeros(num_ps,dtype=bool)
+    used_ref = np.zeros(num_ref,dtype=bool)
+    idx = []
+    idx_ref = []
+    for i,j in zip(pairs['i'][order],pairs['j'][order]):
+        if not used[i] and not used_ref[j]:
+            used[i] = used_ref[j] = True
+            idx.append(i)
+            idx_ref.append(j)
+
+    return np.array(idx,dtype=int),np.array(idx_ref,dtype=int)
+
+def _match_optimal(pairs,num_ps,radius):
+    """
+    Match the most pairs with the least total distance, by assignments in
+    each connected component of the pairs.
+    """
+    idx = []
+    idx_ref = []
+    if len(pairs) == 0:
+        return np.array(idx,dtype=int),np.array(idx_ref,dtype=int)
+    # Nodes of ps and references in one graph
+    nodes_ref = pairs['j'] + num_ps
+    num_nodes = num_ps + nodes_ref.max() + 1
+    graph = coo_matrix((np.ones(len(pairs)),(pairs['i'],nodes_ref)),
+                       shape=(num_nodes,num_nodes))
+    _,labels = connected_components(graph,directed=False)
+    comps = labels[pairs['i']]
+    order = np.argsort(comps,kind='stable')
+    bounds = np.flatnonzero(np.diff(comps[order])) + 1
+    for sub in np.split(order,bounds):
+        rows,row_idx = np.unique(pairs['i'][sub],return_inverse=True)
+        cols,col_idx = np.unique(pairs['j'][sub],return_inverse=True)
+        # Any assignment out of the pairs costs more than all the pairs
+        cost = np.full((len(rows),len(cols)),radius*(len(sub)+1)+1.0)
+        cost[row_idx,col_idx] = pairs['v'][sub]
+        r,c = linear_sum_assignment(cost)
+        valid = cost[r,c] <= radius
+        idx.extend(rows[r[valid]])
+        idx_ref.extend(cols[c[valid]])
+    idx = np.array(idx,dtype=int)
+    idx_ref = np.array(idx_ref,dtype=int)
+    order = np.argsort(idx)
+
+    return idx[order],idx_ref[order]
+
+@contextmanager
+def open_image(imgpath,hdu=0,memmap=True):
+    """
+    Open a FITS image and yield the HDU, the file is closed at exit.
+
+    Parameters
+    ----------
+    imgpath: str
+        path of the fits image
+    hdu: int or str
+        Index or name of the HDU
+    memmap: bool
+        Whether to map the data to memory instead of reading it
+    """
+    with fits.open(imgpath,memmap=memmap) as hdulist:
+        yield hdulist[hdu]
+
+def img2mat(imgpath,hdu=0,memmap=False,section=None,dtype=None):
     """
     Load image
 
@@ -142,24 +405,260 @@ def img2mat(imgpath):
     ---------
     imgpath: str
         path of the image,the image can be fits or other image type files
+    hdu: int or str
+        Index or name of the HDU of the fits image
+    memmap: bool
+        Map the fits data to memory without copying, the pixels are read
+        only when they are accessed.
+    section: tuple
+        Slices of the cutout to read, e.g., (slice(0,512),slice(0,512)),
+        only the cutout is read from the fits file by ImageHDU.section.
+    dtype: np.dtype
+        Convert the image to dtype, e.g., np.float32, keep the type if None.
     """
     # Judge type of path
     postfix = os.path.splitext(imgpath)[-1]
     if postfix == '.fits':
         try:
-            img = fits.open(imgpath)
+            with open_image(imgpath,hdu,memmap) as img:
+                if section is None:
+                    img_mat = img.data
+                else:
+                    img_mat = img.section[section]
         except IOError:
             sys.exit("The image can't be loaded.")
-        img_mat = img[0].data
     else:
+        # scipy.ndimage.imread is removed from SciPy
+        from matplotlib.image import imread
         try:
-            img_mat = imread(imgpath,mode='L')
+            img_mat = imread(imgpath)
         except IOError:
             sys.exit("The image can't be loaded.")
-        img_mat = np.array(img_mat,dtype=float)/255
+        # PNG is read as floats in [0,1], the others as 8-bit integers
+        if img_mat.dtype.kind == 'f':
+            img_mat = img_mat*255
+        # Gray levels of the RGB(A) images, as mode 'L' of PIL
+        if img_mat.ndim == 3:
+            img_mat = img_mat[...,0:3].dot([0.299,0.587,0.114])
+        img_mat = np.asarray(img_mat,dtype=dtype or float)/255
+        if section is not None:
+            img_mat = img_mat[section]
+
+    # The byte order of the fits data is kept, so a memmap is not copied
+    if dtype is not None and img_mat.dtype.newbyteorder('=') != dtype:
+        img_mat = img_mat.astype(dtype,copy=False)
 
     return img_mat
 
+def get_img_shape(imgpath,hdu=0):
+    """Get the shape of the image without reading the pixels"""
+    postfix = os.path.splitext(imgpath)[-1]
+    if postfix == '.fits':
+        with open_image(imgpath,hdu) as img:
+            return img.shape
+    return img2mat(imgpath).shape
+
+def _get_col_range(hdu,col):
+    """Get the (TLMIN,TLMAX) of the column, None if not provided"""
+    names = [name.lower() for name in hdu.columns.names]
+    if col.lower() not in names:
+        raise KeyError("No column %s in the event list" % col)
+    idx = names.index(col.lower()) + 1
+    header = hdu.header
+    if "TLMIN%d" % idx in header and "TLMAX%d" % idx in header:
+        return header["TLMIN%d" % idx],header["TLMAX%d" % idx]
+    return None
+
+def get_evt_grid(evtpath,hdu="EVENTS",cols=("x","y"),binsize=1.0,
+                 ranges=None,chunk_rows=1000000):
+    """
+    Get the binning grid of a FITS event list
+
+    Parameters
+    ----------
+    evtpath: str
+        Path of the event list
+    hdu: int or str
+        Index or name of the event table
+    cols: tuple
+        Columns of the x and y coordinates
+    binsize: float
+        Size of the bins
+    ranges: tuple
+        ((xmin,xmax),(ymin,ymax)) of the binned coordinates. A range not
+        provided, i.e., None or empty, is taken from the TLMIN/TLMAX of the
+        column, or the extent of the events by a pass over the table.
+    chunk_rows: int
+        Number of events read at once
+
+    Returns
+    -------
+    grid: tuple
+        ((x0,nx),(y0,ny)), lower edges and numbers of the bins
+    """
+    with fits.open(evtpath,memmap=True) as hdulist:
+        table = hdulist[hdu]
+        if ranges is None:
+            ranges = (None,None)
+        grid = []
+        for col,col_range in zip(cols,ranges):
+            if col_range is None or len(col_range) != 2:
+                col_range = _get_col_range(table,col)
+            if col_range is not None:
+                low,high = col_range
+                num = int(np.ceil((high-low)/binsize))
+            else:
+                # Extent of the events, the largest one is in the last bin
+                low,high = np.inf,-np.inf
+                for start in range(0,len(table.data),chunk_rows):
+                    values = table.data[start:start+chunk_rows].field(col)
+                    if len(values) > 0:
+                        low = min(low,values.min())
+                        high = max(high,values.max())
+                num = int(np.floor((high-low)/binsize)) + 1
+            grid.append((float(low),max(num,1)))
+
+    return tuple(grid)
+
+def evt2mat(evtpath,hdu="EVENTS",cols=("x","y"),binsize=1.0,grid=None,
+            energy_col="energy",energy_range=None,chunk_rows=1000000,
+            section=None,dtype=None):
+    """
+    Bin the events of a FITS event list as the image. The table is read
+    chunk by chunk, so the memory is bounded by the image and a chunk.
+
+    Parameters
+    ----------
+    evtpath: str
+        Path of the event list
+    hdu: int or str
+        Index or name of the event table
+    cols: tuple
+        Columns of the x and y coordinates
+    binsize: float
+        Size of the bins
+    grid: tuple
+        ((x0,nx),(y0,ny)) of get_evt_grid, got from the file if None
+    energy_col: str
+        Column of the energy
+    energy_range: tuple
+        (min,max) of the energy, the events out of [min,max) are discarded,
+        no filter if None
+    chunk_rows: int
+        Number of events read at once
+    section: tuple
+        Slices of the cutout to bin, e.g., (slice(0,512),slice(0,512))
+    dtype: np.dtype
+        Type of the image, float by default
+
+    Returns
+    -------
+    img_mat: np.ndarray
+        The counts image, rows are along y
+    """
+    if grid is None:
+        grid = get_evt_grid(evtpath,hdu,cols,binsize,chunk_rows=chunk_rows)
+    (x0,nx),(y0,ny) = grid
+    if section is not None:
+        row_start,row_stop,_ = section[0].indices(ny)
+        col_start,col_stop,_ = section[1].indices(nx)
+        y0,ny = y0 + row_start*binsize,row_stop - row_start
+        x0,nx = x0 + col_start*binsize,col_stop - col_start
+    counts = np.zeros(nx*ny)
+    with fits.open(evtpath,memmap=True) as hdulist:
+        data = hdulist[hdu].data
+        for start in range(0,len(data),chunk_rows):
+            chunk = data[start:start+chunk_rows]
+            ix = np.floor((chunk.field(cols[0])-x0)/binsize)
+            iy = np.floor((chunk.field(cols[1])-y0)/binsize)
+            valid = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+            if energy_range is not None and len(energy_range) == 2:
+                energy = chunk.field(energy_col)
+                valid &= ((energy >= energy_range[0]) &
+                          (energy < energy_range[1]))
+            idx = iy[valid].astype(np.int64)*nx + ix[valid].astype(np.int64)
+            if len(idx) == 0:
+                continue
+            low,high = idx.min(),idx.max()
+            if high - low <= 4*len(idx):
+                # Histogram of the span of the chunk
+                counts[low:high+1] += np.bincount(idx-low)
+            else:
+                idx,num = np.unique(idx,return_counts=True)
+                counts[idx] += num
+
+    return counts.reshape(ny,nx).astype(dtype or float,copy=False)
+
+def pyrdown(img_mat,sigma=1.0):
+    """
+    Downsample the image by 2 after Gaussian smoothing, i.e., the next
+    level of the Gaussian pyramid. Pixel (i,j) of the result is centered
+    at (2i,2j) of the input, and the sum of the image is kept.
+
+    Reference
+    ---------
+    [1] Pyramid (image processing)
+        https://en.wikipedia.org/wiki/Pyramid_(image_processing)
+    """
+    img_mat = np.asarray(img_mat)
+    if img_mat.dtype.kind != 'f':
+        img_mat = img_mat.astype(float)
+    img_smooth = gaussian_filter(img_mat,sigma,mode='constant',cval=0.0)
+    return img_smooth[::2,::2] * 4
+
+def gen_field(shape=(512,512),num_ps=50,bkg=0.3,axes=(2.0,6.0),
+              flux=(20.0,80.0),seed=None):
+    """
+    Generate a synthetic field, whose counts are Poisson samples of a flat
+    background and elliptical Gaussian point sources.
+
+    Parameters
+    ----------
+    shape: tuple
+        Shape of the image
+    num_ps: int
+        Number of the point sources
+    bkg: float
+        Mean counts of the background per pixel
+    axes: tuple
+        Range of the sigmas of the point sources
+    flux: tuple
+        Range of the peak counts of the point sources
+    seed: int
+        Seed of the random generator
+
+    Returns
+    -------
+    img_mat: np.ndarray
+        The counts image
+    ps: np.ndarray
+        A (num_ps,5) matrix of (core_x,core_y,axis_x,axis_y,angle), where
+        the angle is in degree
+    """
+    rng = np.random.default_rng(seed)
+    rows,cols = shape
+    margin = 3*axes[1]
+    ps = np.zeros((num_ps,5))
+    ps[:,0] = rng.uniform(margin,cols-margin,num_ps)
+    ps[:,1] = rng.uniform(margin,rows-margin,num_ps)
+    ps[:,2:4] = rng.uniform(axes[0],axes[1],(num_ps,2))
+    ps[:,4] = rng.uniform(0,180,num_ps)
+    peaks = rng.uniform(flux[0],flux[1],num_ps)
+    model = np.full(shape,float(bkg))
+    half = int(np.ceil(margin))
+    for (x,y,ax,ay,ang),peak in zip(ps,peaks):
+        # Only the box within 3 sigmas is painted
+        y0,y1 = max(int(y)-half,0),min(int(y)+half+1,rows)
+        x0,x1 = max(int(x)-half,0),min(int(x)+half+1,cols)
+        [X,Y] = np.meshgrid(np.arange(x0,x1)-x,np.arange(y0,y1)-y)
+        t = np.deg2rad(ang)
+        u = X*np.cos(t) + Y*np.sin(t)
+        v = -X*np.sin(t) + Y*np.cos(t)
+        model[y0:y1,x0:x1] += peak*np.exp(-0.5*(u**2/ax**2+v**2/ay**2))
+    img_mat = rng.poisson(model).astype(float)
+
+    return img_mat,ps
+
 def cluster(pslist,dist=5,itertime=3):
     """Cluster of potential point sources
 
@@ -223,7 +722,79 @@ def cluster(pslist,dist=5,itertime=3):
 
     return final_list
 
-def logManager(loglevel="INFO",toolname="egf2ps",appname = ""):
+def cluster_kdtree(pslist,dist=5,itertime=3,method='greedy'):
+    """Cluster of potential point sources with a KD-tree
+
+    Parameter
+    ---------
+    pslist: np.ndarray
+        The potential point sources, columns are core_x,core_y,axis_x,
+        axis_y,angle,peak, and the rest are ignored.
+    dist: float
+        Smallest distance between to point sources to be clustered
+    itertime: int
+        Time of iteration
+    method: str
+        'greedy': each unclustered source in order takes the unclustered
+        sources within dist as a cluster, the same as cluster;
+        'components': sources linked by pairs within dist are a cluster.
+
+    Note
+    ----
+    A cluster is aggregated as cluster does, i.e., the rounded mean core,
+    mean axes, the max peak and the angle of the first source with the
+    max peak. Clusters are ordered by their first sources.
+    """
+    ps = np.array(pslist[:,0:6],dtype=float)
+    for t in range(itertime):
+        num_ps = ps.shape[0]
+        if num_ps == 0:
+            break
+        # Pairs within dist as a sparse adjacency matrix
+        tree = cKDTree(ps[:,0:2])
+        pairs = tree.query_pairs(dist,output_type='ndarray')
+        graph = coo_matrix((np.ones(len(pairs)),(pairs[:,0],pairs[:,1])),
+                           shape=(num_ps,num_ps))
+        if method == 'components':
+            num_cls,labels = connected_components(graph,directed=False)
+            # Order the clusters by their first sources
+            _,first = np.unique(labels,return_index=True)
+            rank = np.empty(num_cls,dtype=int)
+            rank[np.argsort(first)] = np.arange(num_cls)
+            labels = rank[labels]
+        else:
+            graph = (graph + graph.T).tocsr()
+            indptr,indices = graph.indptr,graph.indices
+            labels = np.full(num_ps,-1)
+            num_cls = 0
+            for i in range(num_ps):
+                if labels[i] >= 0:
+                    continue
+                idx = indices[indptr[i]:indptr[i+1]]
+                labels[idx[labels[idx] < 0]] = num_cls
+                labels[i] = num_cls
+                num_cls += 1
+        ps = _aggregate(ps,labels,num_cls)
+
+    return ps
+
+def _aggregate(ps,labels,num_cls):
+    """Aggregate the point sources of each cluster"""
+    count = np.bincount(labels,minlength=num_cls)
+    agg = np.zeros((num_cls,6))
+    for col in range(4):
+        agg[:,col] = np.bincount(labels,ps[:,col],minlength=num_cls)/count
+    agg[:,0:2] = np.round(agg[:,0:2])
+    # The first source with the max peak of each cluster
+    order = np.lexsort((np.arange(len(labels)),-ps[:,5],labels))
+    first = order[np.r_[0,np.flatnonzero(np.diff(labels[order]))+1]]
+    agg[:,4] = ps[first,4]
+    agg[:,5] = ps[first,5]
+
+    return agg
+
+def logManager(loglevel="INFO",toolname="egf2ps",appname = "",
+               logpath=None,quiet=False):
     """
     A simple logging manger to configure the logging style.
 
@@ -236,6 +807,10 @@ def logManager(loglevel="INFO",toolname="egf2ps",appname = ""):
        Name of the tool.
     appname: str
        Name of the method or class.
+    logpath: str
+       Filepath to also save the log messages, if provided.
+    quiet: bool
+       Do not show the messages on the console.
 
     Reference
     ---------
@@ -247,12 +822,20 @@ def logManager(loglevel="INFO",toolname="egf2ps",appname = ""):
     formatter = logging.Formatter(
                     '[%(levelname)s %(asctime)s]'+ toolname +
                     '--%(name)s: %(message)s')
-    # Set handler
-    handler = logging.StreamHandler()
-    handler.setFormatter(formatter)
+    # Set handlers
+    handlers = []
+    if not quiet:
+        handlers.append(logging.StreamHandler())
+    if logpath is not None:
+        handlers.append(logging.FileHandler(logpath))
+    if len(handlers) == 0:
+        # Nothing falls back to the console
+        handlers.append(logging.NullHandler())
     # Initialize logger
     logger = logging.getLogger(appname)
-    logger.addHandler(handler)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
     # Set level
     level = "logging." + loglevel
     logger.setLevel(eval(level))
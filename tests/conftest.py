@@ -0,0 +1,47 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+"""
+Fixtures of the tests, i.e., a synthetic field saved as a FITS image with
+its reference region file, and the configurations of it.
+"""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from egf2ps.configs import Configs
+from egf2ps.utils import utils
+
+@pytest.fixture(scope="session")
+def field(tmp_path_factory):
+    """Paths of the image and the reference of a 200x200 field"""
+    dirname = tmp_path_factory.mktemp("field")
+    imgmat,ps = utils.gen_field((200,200),num_ps=20,seed=5)
+    imgpath = str(dirname / "field.fits")
+    fits.PrimaryHDU(imgmat).writeto(imgpath)
+    refpath = str(dirname / "field.reg")
+    utils.mat2reg(np.round(ps),refpath)
+
+    return imgpath,refpath
+
+@pytest.fixture
+def make_configs(field,tmp_path):
+    """Get the configurations of the field, updated by section/key values"""
+    imgpath,refpath = field
+
+    def _make_configs(**values):
+        sections = {"input": {"imgpath": imgpath,"refpath": refpath},
+                    "filter": {"scale_x": "4,8","scale_y": "4,8",
+                               "sigma_x": "1,1.5","sigma_y": "1,2"},
+                    "output": {"dirname": str(tmp_path),"save": "False"}}
+        for key,value in values.items():
+            sec,name = key.split("__")
+            sections.setdefault(sec,{})[name] = str(value)
+        lines = []
+        for sec,items in sections.items():
+            lines.append("[%s]" % sec)
+            lines.extend("%s = %s" % item for item in items.items())
+        return Configs(lines)
+
+    return _make_configs
@@ -0,0 +1,38 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import os
+import shutil
+
+from egf2ps.detector import BatchRunner
+from egf2ps.detector import batch
+
+def test_same_names_not_overwritten(field,make_configs,tmp_path):
+    imgpath,_ = field
+    images = []
+    for obs in ("obsA","obsB"):
+        os.makedirs(str(tmp_path / obs))
+        images.append(str(tmp_path / obs / "img.fits"))
+        shutil.copy(imgpath,images[-1])
+    images.append(str(tmp_path / "other.fits"))
+    shutil.copy(imgpath,images[-1])
+    configs = make_configs(peaks__threshold=0.3,snr__threshold=0.3)
+    runner = BatchRunner(configs,images)
+    regpaths = [runner.get_regpath(img) for img in images]
+    assert len(set(regpaths)) == 3
+    assert os.path.basename(regpaths[2]) == "other.reg"
+    records = runner.run()
+    assert all(record["status"] == "done" for record in records)
+    assert all(os.path.exists(regpath) for regpath in regpaths)
+
+def test_get_images(tmp_path):
+    images = [str(tmp_path / name) for name in ("a.fits","b.png","c.fit")]
+    for imgpath in images:
+        open(imgpath,'w').close()
+    # An image which is not FITS is not read as a manifest
+    assert batch.get_images(images[1]) == [images[1]]
+    assert batch.get_images(str(tmp_path / "*.fit*")) == [images[0],images[2]]
+    manifest = str(tmp_path / "images.txt")
+    with open(manifest,'w') as fp:
+        fp.write("# Images\n%s\n\n%s\n" % (images[2],images[1]))
+    assert batch.get_images('@' + manifest) == [images[2],images[1]]
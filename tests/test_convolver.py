@@ -0,0 +1,32 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import numpy as np
+import pytest
+from scipy.ndimage import convolve
+
+from egf2ps.basiclass import Convolver
+
+@pytest.mark.parametrize("mode",["auto","direct","fft","oa"])
+@pytest.mark.parametrize("kshape",[(5,5),(4,6),(7,4),(41,45)])
+def test_same_as_ndimage(mode,kshape):
+    rng = np.random.default_rng(0)
+    imgmat = rng.poisson(2.0,(37,40)).astype(float)
+    psf = rng.random(kshape)
+    expected = convolve(imgmat,psf,mode='constant',cval=0.0)
+    convolver = Convolver(imgmat,mode=mode)
+    np.testing.assert_allclose(convolver.convolve(psf),expected,
+                               rtol=1e-10,atol=1e-10)
+
+@pytest.mark.parametrize("mode",["auto","fft"])
+@pytest.mark.parametrize("kshape",[(3,3),(4,4),(9,8)])
+def test_reserved_kernel_shape(mode,kshape):
+    rng = np.random.default_rng(1)
+    imgmat = rng.poisson(2.0,(64,50)).astype(float)
+    # The spectrum padded for the reserved kernel is shared
+    convolver = Convolver(imgmat,mode=mode,kernel_shape=(17,17))
+    for _ in range(2):
+        psf = rng.random(kshape)
+        expected = convolve(imgmat,psf,mode='constant',cval=0.0)
+        np.testing.assert_allclose(convolver.convolve(psf),expected,
+                                   rtol=1e-10,atol=1e-10)
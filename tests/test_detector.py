@@ -0,0 +1,32 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import numpy as np
+
+from egf2ps.detector import Detector
+
+def test_performance_empty(make_configs):
+    detector = Detector(make_configs())
+    match = detector.get_performance(np.zeros((0,6)))
+    assert match["tp"] == 0 and match["fn"] == 20
+
+def test_coarse_angles_without_peaks(make_configs):
+    # No coarse angle reaches min_snr, so no fine angle is run
+    configs = make_configs(filter__angle_coarse=3,snr__min_snr=1000,
+                           peaks__threshold=0.3)
+    detector = Detector(configs)
+    pslists = list(detector.get_pslists(detector.read_image(),
+                                        detector.get_filterbank().get_groups()))
+    num_coarse = sum(len(group[3][::3])
+                     for group in detector.get_filterbank().get_groups())
+    assert len(pslists) == num_coarse
+    assert len(detector.get_final()) > 0
+
+def test_save_empty(make_configs,tmp_path):
+    # Nothing survives the pruning
+    configs = make_configs(snr__prune="absolute",snr__min_snr=1000,
+                           output__save=True,output__catalog="fits")
+    pslist = Detector(configs).get_final()
+    assert len(pslist) == 0
+    assert open(str(tmp_path / "pslist.reg")).read() == ""
+    assert (tmp_path / "pslist.fits").exists()
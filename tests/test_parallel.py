@@ -0,0 +1,16 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import numpy as np
+import pytest
+
+from egf2ps.detector import Detector
+
+@pytest.mark.parametrize("steerable",[False,True])
+def test_parallel_same_as_serial(make_configs,steerable):
+    values = dict(filter__steerable=steerable)
+    serial = Detector(make_configs(runtime__workers=1,**values))
+    parallel = Detector(make_configs(runtime__workers=2,**values))
+    pslist = serial.get_potential()
+    assert len(pslist) > 0
+    assert np.array_equal(parallel.get_potential(),pslist)
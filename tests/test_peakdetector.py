@@ -0,0 +1,95 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import numpy as np
+import pytest
+from scipy.ndimage import maximum_filter
+
+from egf2ps.basiclass import EGFilter
+from egf2ps.basiclass import PeakDetector
+from egf2ps.basiclass import suppress_peaks
+
+def legacy_peaks(imgnorm,threshold,neighbors):
+    """
+    The iterative search of the global maximum which locate_peaks replaced,
+    kept as the reference of the 'greedy' method
+    """
+    peaks = []
+    cord_x = []
+    cord_y = []
+    rows,cols = imgnorm.shape
+    imgnorm = imgnorm.copy()
+    # Find peaks
+    flag = 1
+    while flag == 1:
+        peak_max = imgnorm.max()
+        if peak_max >= threshold:
+            peak_y,peak_x = np.where(imgnorm==peak_max)
+            for i in range(len(peak_x)):
+                # Judge and fill
+                mask_x = np.arange(peak_x[i]-neighbors,peak_x[i]+neighbors+1,1)
+                mask_y = np.arange(peak_y[i]-1-neighbors,peak_y[i]+neighbors+1,1)
+                x_b = np.where(mask_x>=0)[0][0]
+                x_e = np.where(mask_x<=cols)[0][-1]
+                y_b = np.where(mask_y>=0)[0][0]
+                y_e = np.where(mask_y<=rows)[0][-1]
+                imgnorm[mask_y[y_b]:mask_y[y_e],mask_x[x_b]:mask_x[x_e]] *= 0.0
+                # append
+                peaks.append(peak_max)
+                cord_x.append(peak_x[i])
+                cord_y.append(peak_y[i])
+        else:
+            flag = 0
+
+    return [peaks,cord_x,cord_y]
+
+def _get_images():
+    """Images of plateaus and ties, and of peaks on the borders"""
+    rng = np.random.default_rng(3)
+    images = [rng.integers(0,6,(40,50)).astype(float) for i in range(4)]
+    # Plateaus wider than the window
+    images.append(np.kron(rng.integers(0,4,(6,7)),np.ones((7,7))))
+    border = rng.random((30,30))*0.5
+    border[0,0] = border[-1,-1] = border[0,-1] = border[-1,0] = 1.0
+    border[0,13] = border[29,17] = border[11,0] = border[19,29] = 0.9
+    images.append(border)
+    return images
+
+def _get_detector(make_configs,imgsmooth,method,scale=3):
+    configs = make_configs(peaks__method=method,peaks__threshold=0.3)
+    egfilter = EGFilter(scale=(scale,scale),sigma=(1,1))
+    return PeakDetector(configs,imgsmooth,egfilter,imgsmooth=imgsmooth)
+
+@pytest.mark.parametrize("scale",[1,3,8])
+def test_greedy_same_as_legacy(make_configs,scale):
+    for imgsmooth in _get_images():
+        detector = _get_detector(make_configs,imgsmooth,'greedy',scale)
+        detector.locate_peaks()
+        peaklist = legacy_peaks(detector.imgnorm,0.3,scale)
+        assert len(peaklist[0]) > 0
+        assert [list(p) for p in detector.peaklist] == peaklist
+
+@pytest.mark.parametrize("scale",[1,3,8])
+def test_suppress_peaks_same_as_legacy(make_configs,scale):
+    for imgsmooth in _get_images():
+        detector = _get_detector(make_configs,imgsmooth,'greedy',scale)
+        cand = detector.get_candidates()
+        keep = suppress_peaks(cand[:,5],cand[:,0],cand[:,1],scale)
+        peaklist = legacy_peaks(detector.imgnorm,0.3,scale)
+        assert cand[keep,5].tolist() == peaklist[0]
+        assert cand[keep,0].tolist() == peaklist[1]
+        assert cand[keep,1].tolist() == peaklist[2]
+
+def test_nms_local_maxima(make_configs):
+    scale = 3
+    for imgsmooth in _get_images():
+        detector = _get_detector(make_configs,imgsmooth,'nms',scale)
+        detector.locate_peaks()
+        peaks,cord_x,cord_y = detector.peaklist
+        assert len(peaks) > 0
+        imgmax = maximum_filter(detector.imgnorm,size=2*scale+1,
+                                mode='constant',cval=-np.inf)
+        cord_x = np.array(cord_x)
+        cord_y = np.array(cord_y)
+        assert np.array_equal(detector.imgnorm[cord_y,cord_x],peaks)
+        assert np.array_equal(imgmax[cord_y,cord_x],peaks)
@@ -0,0 +1,79 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import numpy as np
+import pytest
+
+from egf2ps.basiclass import PointSource
+from egf2ps.basiclass import IntegralImage
+from egf2ps.basiclass import compute_snr
+
+ROWS,COLS = 60,70
+
+@pytest.fixture(scope="module")
+def img_mat():
+    rng = np.random.default_rng(7)
+    return rng.poisson(5.0,(ROWS,COLS)).astype(float) + 1.0
+
+def _get_sources(rng,num_ps,low,high):
+    """Cores between low and high, and the axes and angles"""
+    cores = np.column_stack((rng.integers(low[0],high[0],num_ps),
+                             rng.integers(low[1],high[1],num_ps)))
+    axes = np.column_stack((rng.uniform(1,4,num_ps),rng.uniform(1,4,num_ps)))
+    # Repeated shapes share the stencils
+    axes[::3] = (2.5,3.5)
+    angles = rng.uniform(0,np.pi,num_ps)
+    angles[::3] = 0.0
+    return cores,axes,angles
+
+def _get_snr_dropped(img_mat,core,axis,ang):
+    """get_snr whose pixels out of the image are dropped instead of read"""
+    rows,cols = img_mat.shape
+    ps = PointSource(core=core,axis=axis,ang=ang)
+    sp = int(max(round(axis[0]),round(axis[1])))
+    power_ps = 0.0
+    area = 0
+    for i in range(-sp,sp+1):
+        for j in range(-sp,sp+1):
+            x,y = core[0]+i,core[1]+j
+            d = (np.hypot(i-ps.f1[0],j-ps.f1[1]) +
+                 np.hypot(i-ps.f2[0],j-ps.f2[1]))
+            if d <= 2*sp and 1 <= x <= cols-1 and 1 <= y <= rows-1:
+                area += 1
+                power_ps += img_mat[y,x]
+    sp = 2*sp
+    x0,x1 = max(core[0]-1-sp,0),min(core[0]+sp-1,cols)
+    y0,y1 = max(core[1]-1-sp,0),min(core[1]+sp-1,rows)
+    power_nb = img_mat[y0:y1,x0:x1].sum() - power_ps
+    bkg_avg = power_nb/((x1-x0+1)*(y1-y0+1) - area)
+    return 20*np.log10(power_ps/(bkg_avg*area))
+
+@pytest.mark.parametrize("with_integral",[False,True])
+def test_same_as_get_snr(img_mat,with_integral):
+    rng = np.random.default_rng(1)
+    # Cores up to the top and left borders, where get_snr reads no pixel
+    # out of the image
+    cores,axes,angles = _get_sources(rng,60,(0,0),(COLS-5,ROWS-5))
+    integral = IntegralImage(img_mat) if with_integral else None
+    snr = compute_snr(img_mat,cores,axes,angles,integral)
+    expected = [PointSource(core=tuple(c),axis=tuple(a),ang=t).get_snr(
+                    img_mat,integral)
+                for c,a,t in zip(cores,axes,angles)]
+    np.testing.assert_allclose(snr,expected,rtol=1e-10)
+
+def test_edges_dropped(img_mat):
+    # The ellipses cross the bottom and right borders
+    cores = np.array([[COLS-2,30],[35,ROWS-1],[COLS-1,ROWS-2]])
+    axes = np.array([[3.0,2.0],[2.0,3.5],[3.0,3.0]])
+    angles = np.array([0.3,0.0,1.2])
+    snr = compute_snr(img_mat,cores,axes,angles)
+    for k in range(len(cores)):
+        ps = PointSource(core=tuple(cores[k]),axis=tuple(axes[k]),
+                         ang=angles[k])
+        # get_snr reads the pixels out of the image
+        with pytest.raises(IndexError):
+            ps.get_snr(img_mat)
+        expected = _get_snr_dropped(img_mat,tuple(cores[k]),axes[k],
+                                    angles[k])
+        assert np.isfinite(snr[k])
+        np.testing.assert_allclose(snr[k],expected,rtol=1e-10)
@@ -0,0 +1,34 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from egf2ps.utils import utils
+from egf2ps.detector import Detector
+
+# The tolerances of benchmarks/check_precision.py
+RTOL_AXIS = 1e-6
+ATOL_PEAK = 1e-4
+
+@pytest.fixture(params=["field","gen_field"])
+def imgpath(request,field,tmp_path):
+    if request.param == "field":
+        return field[0]
+    img_mat,_ = utils.gen_field((256,256),seed=11)
+    imgpath = str(tmp_path / "gen_field.fits")
+    fits.writeto(imgpath,img_mat)
+    return imgpath
+
+def test_float32_same_as_float64(make_configs,imgpath):
+    ps64 = Detector(make_configs(runtime__precision="float64"),
+                    imgpath=imgpath).get_final()
+    ps32 = Detector(make_configs(runtime__precision="float32"),
+                    imgpath=imgpath).get_final()
+    assert ps64.shape[0] > 0
+    assert ps64.shape == ps32.shape
+    assert np.array_equal(ps64[:,0:2],ps32[:,0:2])
+    # The angles of the nearly circular sources are not compared
+    np.testing.assert_allclose(ps32[:,2:4],ps64[:,2:4],rtol=RTOL_AXIS,atol=0)
+    np.testing.assert_allclose(ps32[:,5],ps64[:,5],rtol=0,atol=ATOL_PEAK)
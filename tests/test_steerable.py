@@ -0,0 +1,40 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import numpy as np
+
+from egf2ps.detector import Detector
+
+def _get_peaks(cand):
+    """Map (filter_id,x,y,angle) of the candidates to their peaks"""
+    keys = zip(cand['filter_id'],cand['x'],cand['y'],cand['angle'])
+    return dict(zip(keys,cand['peak']))
+
+def test_steerable_same_candidates(make_configs):
+    direct = Detector(make_configs())
+    steer = Detector(make_configs(filter__steerable=True))
+    tol = steer.Configs.getn_value('filter/steer_tol')
+    peaks = _get_peaks(direct.get_candidates())
+    peaks_steer = _get_peaks(steer.get_candidates())
+    assert len(peaks) == len(peaks_steer)
+    # Only the near ties of neighboring pixels may swap
+    missed = set(peaks) - set(peaks_steer)
+    assert len(missed) <= 2
+    for key in missed:
+        fid,x,y,angle = key
+        near = [k for k in set(peaks_steer) - set(peaks)
+                if k[0] == fid and k[3] == angle
+                and abs(k[1]-x) <= 1 and abs(k[2]-y) <= 1]
+        assert len(near) == 1
+        assert abs(peaks_steer[near[0]] - peaks[key]) <= tol*peaks[key]
+    common = [key for key in peaks if key in peaks_steer]
+    np.testing.assert_allclose([peaks_steer[k] for k in common],
+                               [peaks[k] for k in common],rtol=0,atol=tol)
+
+def test_steerable_same_final(make_configs):
+    direct = Detector(make_configs()).get_final()
+    steer = Detector(make_configs(filter__steerable=True)).get_final()
+    assert direct.shape == steer.shape
+    # Cores and axes, the angles of the nearly round sources may differ
+    assert np.array_equal(direct[:,0:4],steer[:,0:4])
+    np.testing.assert_allclose(direct[:,5],steer[:,5],rtol=1e-3)
@@ -0,0 +1,30 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import json
+
+import numpy as np
+import pytest
+
+from egf2ps.detector import ThresholdSweep
+
+@pytest.mark.parametrize("workers",[1,2])
+def test_sweep_with_empty_points(make_configs,tmp_path,workers):
+    # snr threshold above 1 leaves no point sources
+    configs = make_configs(sweep__peak_thresholds="0.3,0.99",
+                           sweep__snr_thresholds="0.3,1.5",
+                           sweep__dists="8,")
+    sweep = ThresholdSweep(configs,workers)
+    records = sweep.run()
+    assert len(records) == 4
+    empty = [r for r in records if r["num_ps"] == 0]
+    assert len(empty) >= 2
+    for record in empty:
+        assert record["tp"] == 0 and record["fp"] == 0
+        assert record["fn"] == 20
+        assert record["precision"] == 0.0 and record["f1"] == 0.0
+    assert sweep.get_best()["num_ps"] > 0
+    sweep.save(str(tmp_path / "sweep"))
+    curves = json.load(open(str(tmp_path / "sweep.json")))["curves"]
+    assert len(curves) == 2
+    assert np.isfinite(sweep.get_table()["err_rate"]).all()
@@ -0,0 +1,56 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import tracemalloc
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from egf2ps.utils import utils
+from egf2ps.detector import Detector
+
+@pytest.mark.parametrize("method",["greedy","nms"])
+def test_tiled_same_as_whole(make_configs,method):
+    # Low threshold, so the suppressions are chained across the tiles
+    values = dict(peaks__threshold=0.05,peaks__method=method)
+    whole = Detector(make_configs(**values)).get_potential()
+    tiled = Detector(make_configs(runtime__tile_size=64,
+                                  **values)).get_potential()
+    assert np.array_equal(whole[:,0:5],tiled[:,0:5])
+    np.testing.assert_allclose(whole[:,5:7],tiled[:,5:7],atol=1e-9)
+
+def test_tiled_steerable_errors_once(make_configs):
+    values = dict(filter__steerable=True,peaks__threshold=0.3)
+    whole = Detector(make_configs(**values))
+    whole.get_potential()
+    tiled = Detector(make_configs(runtime__tile_size=64,**values))
+    tiled.get_potential()
+    assert len(tiled.steer_errors) == len(whole.steer_errors)
+
+def _get_peak_memory(make_configs,tmp_path,size,tile_size):
+    """Peak memory of get_candidates besides the candidates returned"""
+    img_mat,_ = utils.gen_field((size,size),num_ps=size*size//2000,seed=1)
+    imgpath = str(tmp_path / ("field_%d.fits" % size))
+    fits.writeto(imgpath,img_mat,overwrite=True)
+    # One group of filters
+    configs = make_configs(runtime__tile_size=tile_size,filter__scale_x="8,",
+                           filter__scale_y="8,",filter__sigma_x="1.5,",
+                           filter__sigma_y="2,")
+    detector = Detector(configs,imgpath=imgpath)
+    detector.get_filterbank()
+    tracemalloc.start()
+    try:
+        cand = detector.get_candidates()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak - cand.nbytes
+
+def test_tiled_memory_bounded(make_configs,tmp_path):
+    tiled = [_get_peak_memory(make_configs,tmp_path,size,64)
+             for size in (128,256)]
+    whole = _get_peak_memory(make_configs,tmp_path,256,0)
+    # Four times the pixels, but the same tiles
+    assert tiled[1] < 1.25*tiled[0]
+    assert tiled[1] < whole
@@ -0,0 +1,73 @@
+# Copyright (c) 2016 Zhixian MA <zxma_sjtu@qq.com>
+# MIT license
+
+import os
+
+import numpy as np
+import pytest
+
+from egf2ps.utils import utils
+
+@pytest.mark.parametrize("method",["greedy","optimal"])
+def test_match_catalog_empty(method):
+    ps = np.array([[10.0,10.0,2,2,0],[50.0,50.0,2,2,0]])
+    empty = np.zeros((0,7))
+    match = utils.match_catalog(empty,ps,5.0,method)
+    assert (match["tp"],match["fp"],match["fn"]) == (0,0,2)
+    assert match["precision"] == 0.0 and match["recall"] == 0.0
+    assert len(match["idx"]) == 0 and len(match["idx_ref"]) == 0
+    match = utils.match_catalog(ps,np.zeros(0),5.0,method)
+    assert (match["tp"],match["fp"],match["fn"]) == (0,2,0)
+
+def test_compare_empty():
+    ps = np.array([[10.0,10.0,2,2,0]])
+    num_same,err_rate,cord_x,cord_y = utils.compare(np.zeros((0,6)),ps)
+    assert num_same == 0 and err_rate == 2.0 and cord_x == []
+    num_same,err_rate,_,_ = utils.compare(ps,np.zeros((0,5)))
+    assert num_same == 0 and np.isnan(err_rate)
+
+@pytest.mark.parametrize("ps",[np.zeros((0,6)),np.zeros(0),[]])
+def test_write_empty(ps,tmp_path):
+    regpath = str(tmp_path / "ps.reg")
+    utils.mat2reg(ps,regpath)
+    assert open(regpath).read() == ""
+    assert len(utils.reg2mat(regpath)) == 0
+    for fmt in ("fits","csv"):
+        catpath = str(tmp_path / ("ps." + fmt))
+        utils.mat2cat(ps,catpath)
+        assert os.path.exists(catpath)
+
+@pytest.mark.parametrize("method",["greedy","components"])
+def test_cluster_kdtree_aggregate(method):
+    # core_x,core_y,axis_x,axis_y,angle,peak,snr
+    pslist = np.array([[10,10,2,3,10,0.5,9],
+                       [50,50,1,1,40,0.3,9],
+                       [12,11,4,5,20,0.9,9],
+                       [11,13,3,4,30,0.9,9]],dtype=float)
+    ps = utils.cluster_kdtree(pslist,dist=5,itertime=1,method=method)
+    assert ps.shape == (2,6)
+    # Rounded mean core, mean axes, max peak, angle of the first max
+    np.testing.assert_allclose(ps[0],[11,11,3,4,20,0.9])
+    np.testing.assert_allclose(ps[1],pslist[1,0:6])
+
+def test_cluster_kdtree_chain():
+    # A chain of sources, each within dist of the next only
+    pslist = np.array([[0,0,1,1,0,0.5],
+                       [4,0,1,1,0,0.6],
+                       [8,0,1,1,0,0.7]],dtype=float)
+    # The seeds take their neighbors in the order of the sources
+    ps = utils.cluster_kdtree(pslist,dist=5,itertime=1,method='greedy')
+    np.testing.assert_allclose(ps[:,0:2],[[2,0],[8,0]])
+    ps = utils.cluster_kdtree(pslist[[1,0,2]],dist=5,itertime=1,
+                              method='greedy')
+    np.testing.assert_allclose(ps[:,0:2],[[4,0]])
+    # The linked sources are one cluster whatever the order
+    for order in ([0,1,2],[2,0,1]):
+        ps = utils.cluster_kdtree(pslist[order],dist=5,itertime=1,
+                                  method='components')
+        np.testing.assert_allclose(ps,[[4,0,1,1,0,0.7]])
+
+@pytest.mark.parametrize("method",["greedy","components"])
+def test_cluster_kdtree_empty(method):
+    ps = utils.cluster_kdtree(np.zeros((0,7)),method=method)
+    assert ps.shape == (0,6)